@@ -0,0 +1,167 @@
+# adjacency.py
+from db_pool import get_connection
+
+
+def create_adjacency_tables():
+    """Create the state_adjacency table and its geometry hash bookkeeping"""
+    with get_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS state_adjacency (
+                        state1_geoid text NOT NULL,
+                        state2_geoid text NOT NULL,
+                        state1 text,
+                        state2 text,
+                        border_length_km double precision,
+                        tax_complexity_level text,
+                        PRIMARY KEY (state1_geoid, state2_geoid)
+                    );
+
+                    CREATE TABLE IF NOT EXISTS state_geometry_hashes (
+                        geoid text PRIMARY KEY,
+                        geom_hash text NOT NULL
+                    );
+                """)
+                conn.commit()
+
+            except Exception as e:
+                print(f"Error creating adjacency tables: {e}")
+
+
+def refresh_state_adjacency(force=False):
+    """Recompute adjacency only for states whose geometry (or name) changed
+
+    Returns the number of states that were recomputed, or None on error.
+    """
+    create_adjacency_tables()
+    with get_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+
+                cur.execute("""
+                    CREATE TEMP TABLE current_hashes ON COMMIT DROP AS
+                    SELECT
+                        "GEOID" AS geoid,
+                        md5("NAME" || encode(ST_AsEWKB(geometry), 'hex')) AS geom_hash
+                    FROM us_states;
+                """)
+
+                if force:
+                    cur.execute("""
+                        CREATE TEMP TABLE changed_geoids ON COMMIT DROP AS
+                        SELECT geoid FROM current_hashes
+                        UNION
+                        SELECT geoid FROM state_geometry_hashes;
+                    """)
+                else:
+                    cur.execute("""
+                        CREATE TEMP TABLE changed_geoids ON COMMIT DROP AS
+                        SELECT c.geoid
+                        FROM current_hashes c
+                        LEFT JOIN state_geometry_hashes h ON h.geoid = c.geoid
+                        WHERE h.geom_hash IS DISTINCT FROM c.geom_hash
+                        UNION
+                        SELECT h.geoid
+                        FROM state_geometry_hashes h
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM current_hashes c WHERE c.geoid = h.geoid
+                        );
+                    """)
+
+                cur.execute("SELECT COUNT(*) FROM changed_geoids;")
+                changed = cur.fetchone()[0]
+                if changed == 0:
+                    conn.commit()
+                    return 0
+
+                cur.execute("""
+                    DELETE FROM state_adjacency
+                    WHERE state1_geoid IN (SELECT geoid FROM changed_geoids)
+                       OR state2_geoid IN (SELECT geoid FROM changed_geoids);
+                """)
+
+                # The && bounding-box test lets the planner use the GiST
+                # index; only pairs touching a changed state are recomputed
+                cur.execute("""
+                    INSERT INTO state_adjacency (
+                        state1_geoid, state2_geoid, state1, state2,
+                        border_length_km, tax_complexity_level
+                    )
+                    SELECT
+                        a."GEOID",
+                        b."GEOID",
+                        a."NAME",
+                        b."NAME",
+                        border.length_km,
+                        CASE
+                            WHEN border.length_km > 500 THEN 'High'
+                            WHEN border.length_km > 200 THEN 'Medium'
+                            ELSE 'Low'
+                        END
+                    FROM us_states a
+                    JOIN us_states b
+                      ON a.geometry && b.geometry
+                     AND ST_Intersects(a.geometry, b.geometry)
+                    CROSS JOIN LATERAL (
+                        SELECT ST_Length(ST_Intersection(a.geometry, b.geometry)::geography)/1000
+                            AS length_km
+                    ) border
+                    WHERE a."NAME" < b."NAME"
+                      AND (a."GEOID" IN (SELECT geoid FROM changed_geoids)
+                           OR b."GEOID" IN (SELECT geoid FROM changed_geoids));
+                """)
+
+                cur.execute("""
+                    DELETE FROM state_geometry_hashes;
+                    INSERT INTO state_geometry_hashes (geoid, geom_hash)
+                    SELECT geoid, geom_hash FROM current_hashes;
+                """)
+
+                conn.commit()
+                print(f"State adjacency refreshed for {changed} changed states")
+                return changed
+
+            except Exception as e:
+                conn.rollback()
+                print(f"Error refreshing state adjacency: {e}")
+    return None
+
+
+def get_adjacency_pairs(order_by="border_length_km DESC"):
+    """Return (state1, state2, border_length_km, tax_complexity_level) rows"""
+    orderings = {
+        "border_length_km DESC": "border_length_km DESC",
+        "name": "state1, state2",
+    }
+    with get_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute(f"""
+                    SELECT state1, state2, border_length_km, tax_complexity_level
+                    FROM state_adjacency
+                    ORDER BY {orderings[order_by]};
+                """)
+                return cur.fetchall()
+
+            except Exception as e:
+                print(f"Error reading state adjacency: {e}")
+    return []
+
+
+def get_state_adjacency():
+    """Return the adjacency graph as {state: {neighbor: border_length_km}}"""
+    graph = {}
+    for state1, state2, length_km, _ in get_adjacency_pairs():
+        graph.setdefault(state1, {})[state2] = length_km
+        graph.setdefault(state2, {})[state1] = length_km
+    return graph
+
+
+if __name__ == "__main__":
+    refresh_state_adjacency()
+    graph = get_state_adjacency()
+    print(f"\n{len(graph)} states with neighbours")
@@ -1,16 +1,18 @@
-import geopandas as gpd
-import pandas as pd
-import matplotlib.pyplot as plt
-from shapely.geometry import Point
 import os
 
+from layer_cache import load_states, read_cache_meta, states_cache_name
+from settings import DOCUMENTATION_DIR
+from summary_stats import summarize_states_frame
+
 def analyze_states():
+    # Plotting libraries are only needed once the analysis runs
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
     try:
-        # Path to your shapefile
-        states_path = r"D:/projects/tax_jurisdiction_mapping/data/raw/tl_2023_us_state.shp"
-        
-        # Read the shapefile
-        states = gpd.read_file(states_path)
+        # Read the states layer from the local GeoParquet cache, which is
+        # rebuilt from the shapefile only when the source files change
+        states = load_states(source="shapefile")
         
         # 1. Basic Information
         print("\n=== Basic Dataset Information ===")
@@ -46,21 +48,24 @@ def analyze_states():
         ax2.axis('off')
         
         # Save the visualization
-        output_path = r"D:/projects/tax_jurisdiction_mapping/documentation/state_analysis.png"
+        output_path = os.path.join(DOCUMENTATION_DIR, "state_analysis.png")
         plt.savefig(output_path)
         plt.close()
         
-        # 4. Export summary statistics
+        # 4. Export summary statistics, stored with the cached layer when it was built
+        summary = (read_cache_meta(states_cache_name("shapefile")) or {}).get("summary")
+        if summary is None:
+            summary = summarize_states_frame(states)
         summary_stats = pd.DataFrame({
-            'Total_States': [len(states)],
-            'Total_Land_Area_km2': [states['area_km2'].sum()],
-            'Average_State_Area_km2': [states['area_km2'].mean()],
-            'Largest_State': [states.loc[states['area_km2'].idxmax(), 'NAME']],
-            'Smallest_State': [states.loc[states['area_km2'].idxmin(), 'NAME']]
+            'Total_States': [summary['state_count']],
+            'Total_Land_Area_km2': [summary['total_area_km2']],
+            'Average_State_Area_km2': [summary['avg_area_km2']],
+            'Largest_State': [summary['largest_state']],
+            'Smallest_State': [summary['smallest_state']]
         })
         
         # Export to CSV
-        stats_path = r"D:/projects/tax_jurisdiction_mapping/documentation/state_statistics.csv"
+        stats_path = os.path.join(DOCUMENTATION_DIR, "state_statistics.csv")
         summary_stats.to_csv(stats_path, index=False)
         
         return states
@@ -0,0 +1,208 @@
+# async_rates.py
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+from db_pool import get_connection
+from settings import DB_POOL_MAX, STATES_SRID
+
+# One round trip per batch: the points travel as arrays and are joined
+# against us_states through the GiST index on geometry
+RESOLVE_RATES_SQL = f"""
+    SELECT
+        p.idx,
+        s."STATEFP",
+        s."STUSPS",
+        s.sales_tax_rate,
+        s.use_tax_rate
+    FROM unnest(%s::int[], %s::float8[], %s::float8[]) AS p(idx, lon, lat)
+    LEFT JOIN LATERAL (
+        SELECT "STATEFP", "STUSPS", sales_tax_rate, use_tax_rate
+        FROM us_states
+        WHERE ST_Contains(geometry, ST_SetSRID(ST_MakePoint(p.lon, p.lat), {STATES_SRID}))
+        LIMIT 1
+    ) s ON true
+    ORDER BY p.idx;
+"""
+
+# Concurrent batch queries; ThreadedConnectionPool raises instead of waiting
+# when it runs dry, so some connections are left for other pool users
+MAX_IN_FLIGHT = max(1, DB_POOL_MAX // 2)
+
+
+def query_rates_batch(lons, lats):
+    """Resolve a batch of coordinates to rates with a single query"""
+    with get_connection() as conn:
+        if conn is None:
+            raise ConnectionError("Database unavailable for rate lookup")
+        cur = conn.cursor()
+        cur.execute(RESOLVE_RATES_SQL, (list(range(len(lons))), list(lons), list(lats)))
+        results = []
+        for _, statefp, stusps, sales, use in cur.fetchall():
+            if statefp is None:
+                results.append(None)
+            else:
+                results.append({
+                    "STATEFP": statefp,
+                    "STUSPS": stusps,
+                    "sales_tax_rate": float(sales) if sales is not None else None,
+                    "use_tax_rate": float(use) if use is not None else None,
+                })
+        return results
+
+
+class RateResolver:
+    """Micro-batching asyncio front end for PostGIS rate lookups
+
+    Individual requests are queued and flushed to the database either when
+    max_batch_size points are waiting or max_wait_ms after the first one
+    arrived, whichever comes first.
+    """
+
+    def __init__(self, max_batch_size=500, max_wait_ms=5.0, max_queue=10_000,
+                 max_in_flight=MAX_IN_FLIGHT):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.max_in_flight = max(1, min(max_in_flight, DB_POOL_MAX - 1))
+        self.queue = None
+        self._task = None
+        # Requests the batch loop has taken off the queue but not dispatched yet
+        self._collecting = []
+        self._in_flight = None
+        self._pending = set()
+        self.latencies = deque(maxlen=100_000)
+        self.batch_sizes = deque(maxlen=10_000)
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._task = asyncio.create_task(self._batch_loop())
+
+    async def stop(self):
+        """Stop batching and settle every request still waiting
+
+        Queued requests, including a batch the loop had collected but not
+        dispatched, are flushed in final batches. Any future left unresolved
+        after that (stop() itself cancelled, a batch task killed) is
+        cancelled, so no caller is left waiting.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        leftover, self._collecting = self._collecting, []
+        while self.queue is not None and not self.queue.empty():
+            leftover.append(self.queue.get_nowait())
+        try:
+            for start in range(0, len(leftover), self.max_batch_size):
+                await self._in_flight.acquire()
+                await self._run_batch(leftover[start:start + self.max_batch_size])
+            if self._pending:
+                await asyncio.gather(*self._pending, return_exceptions=True)
+        finally:
+            for _, _, future, _ in leftover:
+                if not future.done():
+                    future.cancel()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def resolve(self, lon, lat):
+        """Resolve one coordinate; waits for its batch to be flushed"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((lon, lat, future, time.perf_counter()))
+        return await future
+
+    async def resolve_rates(self, points):
+        """Resolve an iterable of (lon, lat) pairs"""
+        return await asyncio.gather(*(self.resolve(lon, lat) for lon, lat in points))
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._collecting = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._in_flight.acquire()
+            task = asyncio.create_task(self._run_batch(batch))
+            self._collecting = []
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            lons = [item[0] for item in batch]
+            lats = [item[1] for item in batch]
+            try:
+                results = await loop.run_in_executor(None, query_rates_batch, lons, lats)
+            except Exception as e:
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            now = time.perf_counter()
+            for (_, _, future, queued_at), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+                self.latencies.append(now - queued_at)
+            self.batch_sizes.append(len(batch))
+        finally:
+            # A cancelled query leaves its callers nothing else to wait for
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.cancel()
+            self._in_flight.release()
+
+    def metrics(self):
+        """Return request latency percentiles (ms) and batching statistics"""
+        if not self.latencies:
+            return {"requests": 0}
+        latencies_ms = np.asarray(self.latencies) * 1000.0
+        return {
+            "requests": len(latencies_ms),
+            "batches": len(self.batch_sizes),
+            "mean_batch_size": float(np.mean(self.batch_sizes)),
+            "p50_ms": float(np.percentile(latencies_ms, 50)),
+            "p99_ms": float(np.percentile(latencies_ms, 99)),
+        }
+
+
+async def resolve_rates(points, resolver=None):
+    """Resolve (lon, lat) points to sales/use rates through a micro-batching resolver"""
+    if resolver is not None:
+        return await resolver.resolve_rates(points)
+    async with RateResolver() as temporary:
+        return await temporary.resolve_rates(points)
+
+
+if __name__ == "__main__":
+    async def demo():
+        rng = np.random.default_rng(0)
+        points = list(zip(rng.uniform(-125.0, -66.0, 5_000), rng.uniform(24.0, 50.0, 5_000)))
+        async with RateResolver() as resolver:
+            results = await resolver.resolve_rates(points)
+            print(f"Resolved {sum(r is not None for r in results):,} of {len(points):,} points")
+            print(resolver.metrics())
+
+    asyncio.run(demo())
@@ -0,0 +1,181 @@
+# benchmark_imports.py
+"""Check cold-start import cost of the scripts against a stored budget
+
+Each module is imported in a fresh interpreter under `python -X importtime`,
+so results are not skewed by modules already loaded in this process:
+
+    python benchmark_imports.py                # compare with benchmarks/import_budget.json
+    python benchmark_imports.py --save-budget  # record the current timings as the budget
+    python benchmark_imports.py --save-budget vector_tiles  # add or update one entry
+
+Exits non-zero when a module exceeds its budget (scaled by how much slower
+a reference import of numpy runs than when the budget was recorded), has
+no budget entry, or pulls in a library it must not load at import time.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_DIR = os.path.join(os.path.dirname(SCRIPTS_DIR), "benchmarks")
+BUDGET_PATH = os.path.join(BENCHMARK_DIR, "import_budget.json")
+
+# Libraries that only the renderers may load, and only when they render
+PLOTTING_MODULES = ["matplotlib", "seaborn", "folium", "branca"]
+# Libraries the lookup and query paths must not pay for at import time
+HEAVY_MODULES = PLOTTING_MODULES + ["geopandas", "pandas", "sqlalchemy", "psycopg2", "pyarrow"]
+
+# Module -> top-level packages it must not import
+IMPORT_CHECKS = {
+    "settings": HEAVY_MODULES,
+    "jurisdiction_index": HEAVY_MODULES,
+    "rate_history": HEAVY_MODULES,
+    "async_rates": HEAVY_MODULES,
+    "tax_rates": HEAVY_MODULES,
+    "rate_transactions": HEAVY_MODULES,
+    "database_utils": HEAVY_MODULES,
+    "spatial_analysis": HEAVY_MODULES,
+    "analyze_states": HEAVY_MODULES,
+    "render_cache": HEAVY_MODULES,
+    "vector_tiles": HEAVY_MODULES,
+    "lookup_service": HEAVY_MODULES,
+    "visualization": PLOTTING_MODULES + ["geopandas", "pandas"],
+}
+
+# Each module is timed by its fastest repeat, which varies far less between
+# runs than the median. Budget = fastest time * headroom when saving, but at
+# least the fastest time plus BUDGET_FLOOR_MS: a few milliseconds of
+# scheduler or disk noise would otherwise fail fast-importing modules; a run
+# fails above budget
+BUDGET_HEADROOM = 1.5
+BUDGET_FLOOR_MS = 15.0
+
+# Imported alongside every module to gauge how loaded the machine is: a
+# module's limit grows by the factor the reference import slowed down since
+# the budget was recorded (it never shrinks), so a busy machine does not
+# fail the check while a module that got slower on its own still does
+REFERENCE_MODULE = "numpy"
+
+
+def budget_for(best_ms):
+    """Import time limit recorded for a module whose fastest import took best_ms"""
+    return round(max(best_ms * BUDGET_HEADROOM, best_ms + BUDGET_FLOOR_MS), 1)
+
+
+def measure_import(module):
+    """Import `module` in a fresh interpreter; returns (cumulative_ms, loaded top-level packages)"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SCRIPTS_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    cumulative_ms = None
+    loaded = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # column header
+        name = name.strip()
+        loaded.add(name.split(".")[0])
+        if name == module:
+            cumulative_ms = int(cumulative) / 1000.0
+    return cumulative_ms, loaded
+
+
+def scaled_limit(limit, reference_ms, recorded_reference_ms):
+    """Budget of a module adjusted for machine load, measured by the reference import"""
+    if not recorded_reference_ms or not reference_ms:
+        return limit
+    return limit * max(1.0, reference_ms / recorded_reference_ms)
+
+
+def run_checks(modules, repeat):
+    """Fastest import time, reference import time and forbidden imports of every module"""
+    results = {}
+    for module in modules:
+        timings = []
+        reference = []
+        loaded = set()
+        try:
+            for _ in range(repeat):
+                reference.append(measure_import(REFERENCE_MODULE)[0])
+                ms, loaded = measure_import(module)
+                timings.append(ms)
+        except RuntimeError as e:
+            results[module] = {"error": str(e)}
+            print(f"{module:25s} ERROR {e}")
+            continue
+        forbidden = sorted(set(IMPORT_CHECKS.get(module, [])) & loaded)
+        results[module] = {"best_ms": min(timings), "reference_ms": min(reference),
+                           "forbidden": forbidden}
+        note = f"  loads {', '.join(forbidden)}" if forbidden else ""
+        print(f"{module:25s} {results[module]['best_ms']:8.1f} ms{note}")
+    return results
+
+
+def compare_to_budget(results, budget):
+    """Return failure messages for modules over budget, without one or loading forbidden libraries"""
+    failures = []
+    limits = budget.get("modules", {})
+    references = budget.get("reference_ms", {})
+    for module, result in results.items():
+        if "error" in result:
+            failures.append(f"{module}: import failed ({result['error']})")
+            continue
+        if result["forbidden"]:
+            failures.append(f"{module}: imports {', '.join(result['forbidden'])} at load time")
+        limit = limits.get(module)
+        if limit is None:
+            failures.append(f"{module}: no import budget (record one with --save-budget {module})")
+            continue
+        limit = scaled_limit(limit, result["reference_ms"], references.get(module))
+        if result["best_ms"] > limit:
+            failures.append(f"{module}: {result['best_ms']:.1f} ms exceeds budget of {limit:.1f} ms")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=list(IMPORT_CHECKS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save-budget", action="store_true",
+                        help="store the current timings (with headroom) as the budget")
+    args = parser.parse_args(argv)
+
+    results = run_checks(args.modules, args.repeat)
+
+    budget = {}
+    if os.path.exists(BUDGET_PATH):
+        with open(BUDGET_PATH) as f:
+            budget = json.load(f)
+
+    if args.save_budget:
+        # Modules not measured in this run keep their recorded budget
+        modules = dict(budget.get("modules", {}))
+        references = dict(budget.get("reference_ms", {}))
+        for module, result in results.items():
+            if "best_ms" in result:
+                modules[module] = budget_for(result["best_ms"])
+                references[module] = round(result["reference_ms"], 1)
+        budget = {"headroom": BUDGET_HEADROOM, "floor_ms": BUDGET_FLOOR_MS,
+                  "reference": REFERENCE_MODULE, "modules": modules, "reference_ms": references}
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        with open(BUDGET_PATH, "w") as f:
+            json.dump(budget, f, indent=2)
+        print(f"Import budget written to {BUDGET_PATH}")
+        return 0
+
+    failures = compare_to_budget(results, budget)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
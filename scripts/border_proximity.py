@@ -0,0 +1,171 @@
+# border_proximity.py
+import time
+
+import numpy as np
+import shapely
+
+from jurisdiction_index import JurisdictionIndex
+from settings import STATES_SRID
+
+# Equal-area CONUS Albers (metres); distances are measured in this CRS
+PROXIMITY_EPSG = 5070
+
+BORDER_COLUMNS = ["GEOID", "STATEFP", "STUSPS", "sales_tax_rate", "use_tax_rate"]
+
+
+# First search radius (km) for nearest(); it grows by SEARCH_GROWTH until
+# every point has found a differently-rated state or SEARCH_LIMIT_KM is reached
+SEARCH_START_KM = 10.0
+SEARCH_GROWTH = 4.0
+SEARCH_LIMIT_KM = 10_000.0
+
+
+def _rates_differ(a, b):
+    """Elementwise a != b where two missing rates count as equal"""
+    both_missing = np.isnan(a) & np.isnan(b)
+    return ~both_missing & ~(a == b)
+
+
+def _border_segments(lines):
+    """Explode border lines into two-point segments for tight nearest queries
+
+    Returns the segments and, for each, the position of the line it came from.
+    """
+    parts, line_idx = shapely.get_parts(lines, return_index=True)
+    # Second pass flattens multi-part geometries nested in collections
+    parts, part_idx = shapely.get_parts(parts, return_index=True)
+    line_idx = line_idx[part_idx]
+
+    coords, owner = shapely.get_coordinates(parts, return_index=True)
+    # Consecutive vertices of the same part form a segment (points yield none)
+    same_part = owner[:-1] == owner[1:]
+    segments = shapely.linestrings(np.stack([coords[:-1][same_part], coords[1:][same_part]], axis=1))
+    return segments, line_idx[owner[:-1][same_part]]
+
+
+class BorderProximityIndex:
+    """Distance from points to the nearest state whose rate differs from their own
+
+    The boundaries of every state are split into segments held in a single
+    STRtree, each tagged with its state's rate. A point's answer is the
+    nearest segment of any state rated differently from the point's state,
+    so rate changes beyond equal-rated neighbours are found too. Candidates
+    are gathered within a growing radius and filtered by rate; a point is
+    settled once its nearest valid candidate lies inside the radius.
+    """
+
+    def __init__(self, gdf, rate_column="sales_tax_rate"):
+        from pyproj import Transformer
+
+        if gdf.crs is not None and gdf.crs.to_epsg() != STATES_SRID:
+            gdf = gdf.to_crs(epsg=STATES_SRID)
+        gdf = gdf.reset_index(drop=True)
+        self.rate_column = rate_column
+        self.locator = JurisdictionIndex(gdf)
+        self.transformer = Transformer.from_crs(STATES_SRID, PROXIMITY_EPSG, always_xy=True)
+
+        projected = np.asarray(gdf.to_crs(epsg=PROXIMITY_EPSG).geometry.values, dtype=object)
+        rates = np.asarray(gdf[rate_column], dtype="float64") if rate_column in gdf else np.full(len(gdf), np.nan)
+        geoids = gdf["GEOID"].to_numpy(dtype=object)
+
+        self.segments, self.segment_state = _border_segments(shapely.boundary(projected))
+        self.tree = shapely.STRtree(self.segments)
+        self.segment_rate = rates[self.segment_state]
+
+        self.geoids = np.append(geoids, None)
+        self.rates = np.append(rates, np.nan)
+
+    def __len__(self):
+        return len(self.geoids) - 1
+
+    @classmethod
+    def from_cache(cls, source="postgis", rate_column="sales_tax_rate"):
+        """Build from the local GeoParquet cache of us_states (with rates)"""
+        from layer_cache import load_states
+
+        return cls(load_states(columns=BORDER_COLUMNS, source=source), rate_column)
+
+    def nearest(self, lon, lat, max_distance_km=None):
+        """Distance (km) from each point to the nearest differently-rated state
+
+        Points outside every state, with no differently-rated state within
+        max_distance_km (or SEARCH_LIMIT_KM) get distance inf and neighbour
+        None. Returns arrays: distance_km, GEOID (of the point's state),
+        neighbour_GEOID and neighbour rate.
+        """
+        lon = np.asarray(lon, dtype="float64")
+        lat = np.asarray(lat, dtype="float64")
+        n = len(lon)
+        state_rows = self.locator.match(lon, lat)
+        x, y = self.transformer.transform(lon, lat)
+        points = shapely.points(x, y)
+        own_rate = self.rates[state_rows]
+
+        distance = np.full(n, np.inf)
+        neighbour = np.full(n, -1, dtype=np.int64)
+        limit_km = SEARCH_LIMIT_KM if max_distance_km is None else max_distance_km
+
+        pending = np.flatnonzero(state_rows >= 0)
+        radius_km = min(SEARCH_START_KM, limit_km)
+        while len(pending):
+            radius = radius_km * 1000.0
+            point_idx, segment_idx = self.tree.query(points[pending], predicate="dwithin", distance=radius)
+            valid = _rates_differ(self.segment_rate[segment_idx], own_rate[pending[point_idx]])
+            point_idx, segment_idx = point_idx[valid], segment_idx[valid]
+            dist = shapely.distance(points[pending[point_idx]], self.segments[segment_idx])
+
+            # Closest valid candidate per point: sort by (point, distance), keep the first
+            order = np.lexsort((dist, point_idx))
+            point_idx, segment_idx, dist = point_idx[order], segment_idx[order], dist[order]
+            first = np.ones(len(point_idx), dtype=bool)
+            first[1:] = point_idx[1:] != point_idx[:-1]
+            settled = pending[point_idx[first]]
+            distance[settled] = dist[first] / 1000.0
+            neighbour[settled] = self.segment_state[segment_idx[first]]
+
+            if radius_km >= limit_km:
+                break
+            pending = pending[np.isinf(distance[pending])]
+            radius_km = min(radius_km * SEARCH_GROWTH, limit_km)
+
+        return {
+            "distance_km": distance,
+            "GEOID": self.geoids[state_rows],
+            "neighbour_GEOID": self.geoids[neighbour],
+            "neighbour_rate": self.rates[neighbour],
+        }
+
+    def within(self, lon, lat, distance_km):
+        """Boolean mask of points within distance_km of a differently-rated state"""
+        return np.isfinite(self.nearest(lon, lat, max_distance_km=distance_km)["distance_km"])
+
+
+def benchmark_proximity(index, n_points=1_000_000, distance_km=25.0, seed=0):
+    """Time nearest() over random points in the continental US"""
+    rng = np.random.default_rng(seed)
+    lon = rng.uniform(-125.0, -66.0, n_points)
+    lat = rng.uniform(24.0, 50.0, n_points)
+
+    start = time.perf_counter()
+    result = index.nearest(lon, lat, max_distance_km=distance_km)
+    elapsed = time.perf_counter() - start
+
+    near = int(np.isfinite(result["distance_km"]).sum())
+    print(f"Checked {n_points:,} points in {elapsed:.3f}s "
+          f"({n_points / elapsed:,.0f} points/sec, {near:,} within {distance_km:g} km of a rate change)")
+    return elapsed
+
+
+if __name__ == "__main__":
+    print("Building border proximity index...")
+    start = time.perf_counter()
+    index = BorderProximityIndex.from_cache()
+    print(f"Indexed {len(index.segments):,} border segments of {len(index)} states "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    print("\nSample (Texarkana, TX):")
+    result = index.nearest([-94.05], [33.43])
+    print({key: values[0] for key, values in result.items()})
+
+    print("\nBenchmarking batch proximity...")
+    benchmark_proximity(index)
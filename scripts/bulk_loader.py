@@ -0,0 +1,268 @@
+# bulk_loader.py
+import io
+import struct
+import time
+import tracemalloc
+
+import numpy as np
+import shapely
+from psycopg2 import sql
+
+from db_pool import get_connection
+from layer_cache import bump_data_version, track_data_version
+from settings import STATES_SHAPEFILE, STATES_SRID
+
+# PostgreSQL binary COPY framing
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+PGCOPY_TRAILER = struct.pack("!h", -1)
+NULL_FIELD = struct.pack("!i", -1)
+
+
+def _encode_text(value):
+    if value is None or value != value:  # None or NaN
+        return NULL_FIELD
+    data = str(value).encode("utf-8")
+    return struct.pack("!i", len(data)) + data
+
+
+def _encode_bigint(value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):  # None, NaN or pd.NA from a nullable column
+        return NULL_FIELD
+    return struct.pack("!iq", 8, value)
+
+
+def _encode_double(value):
+    if value is None or value != value:
+        return NULL_FIELD
+    return struct.pack("!id", 8, float(value))
+
+
+def _column_types(gdf, geom_col):
+    """Map each attribute column of a chunk to a PostgreSQL type and encoder"""
+    columns = []
+    for name, dtype in gdf.dtypes.items():
+        if name == geom_col:
+            continue
+        if dtype.kind in "iu":
+            columns.append((name, "bigint", _encode_bigint))
+        elif dtype.kind == "f":
+            columns.append((name, "double precision", _encode_double))
+        else:
+            columns.append((name, "text", _encode_text))
+    return columns
+
+
+def _multipolygon_wkb(geoms, srid):
+    """Encode geometries as EWKB, promoting Polygons to MultiPolygons"""
+    geoms = np.asarray(geoms, dtype=object)
+    is_polygon = shapely.get_type_id(geoms) == 3
+    if is_polygon.any():
+        geoms = geoms.copy()
+        geoms[is_polygon] = shapely.multipolygons(geoms[is_polygon].reshape(-1, 1))
+    geoms = shapely.set_srid(geoms, srid)
+    return shapely.to_wkb(geoms, include_srid=True)
+
+
+def encode_copy_chunk(gdf, columns, geom_col, srid):
+    """Encode a GeoDataFrame chunk as a binary COPY stream"""
+    buf = io.BytesIO()
+    buf.write(PGCOPY_HEADER)
+
+    field_count = struct.pack("!h", len(columns) + 1)
+    values = [(gdf[name].to_numpy(dtype=object), encode) for name, _, encode in columns]
+    wkb = _multipolygon_wkb(gdf[geom_col].values, srid)
+
+    for i in range(len(gdf)):
+        buf.write(field_count)
+        for column_values, encode in values:
+            buf.write(encode(column_values[i]))
+        if wkb[i] is None:
+            buf.write(NULL_FIELD)
+        else:
+            buf.write(struct.pack("!i", len(wkb[i])))
+            buf.write(wkb[i])
+
+    buf.write(PGCOPY_TRAILER)
+    buf.seek(0)
+    return buf
+
+
+def _carry_over_columns(cur, table, staging, loaded_columns, key_column):
+    """Copy columns that only exist in the live table (e.g. tax rates) into staging
+
+    Derived geometry columns (simplified levels of detail) are recreated
+    empty rather than copied, since they would be stale for new geometries.
+    Nothing is carried over from a live table without key_column (such as
+    a pre-TIGER schema) or without rows, as there is nothing to match.
+    """
+    cur.execute("""
+        SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+        FROM pg_attribute a
+        WHERE a.attrelid = to_regclass(%s)
+          AND a.attnum > 0
+          AND NOT a.attisdropped
+        ORDER BY a.attnum;
+    """, (table,))
+    live_columns = cur.fetchall()
+    if key_column not in {name for name, _ in live_columns}:
+        return []
+    extra = [(name, col_type) for name, col_type in live_columns
+             if name not in loaded_columns]
+    if not extra:
+        return []
+    cur.execute(sql.SQL("SELECT EXISTS (SELECT 1 FROM {});").format(sql.Identifier(table)))
+    if not cur.fetchone()[0]:
+        return []
+
+    for name, col_type in extra:
+        cur.execute(sql.SQL("ALTER TABLE {} ADD COLUMN {} " + col_type).format(
+            sql.Identifier(staging), sql.Identifier(name)))
+
+    copied = [name for name, col_type in extra if not col_type.startswith("geometry")]
+    if not copied:
+        return []
+
+    names = [sql.Identifier(name) for name in copied]
+    cur.execute(sql.SQL("""
+        UPDATE {staging} s
+        SET ({targets}) = ({sources})
+        FROM {table} o
+        WHERE s.{key} = o.{key};
+    """).format(
+        staging=sql.Identifier(staging),
+        table=sql.Identifier(table),
+        targets=sql.SQL(", ").join(names),
+        sources=sql.SQL(", ").join(sql.SQL("o.") + n for n in names),
+        key=sql.Identifier(key_column),
+    ))
+    return copied
+
+
+def _swap_tables(cur, table, staging, geom_col):
+    """Index the staging table and replace the live table with it"""
+    staging_index = f"idx_{staging}_{geom_col}"
+    cur.execute(sql.SQL("CREATE INDEX {} ON {} USING GIST ({});").format(
+        sql.Identifier(staging_index), sql.Identifier(staging), sql.Identifier(geom_col)))
+    cur.execute(sql.SQL("ANALYZE {};").format(sql.Identifier(staging)))
+
+    # CASCADE also drops views built on the live table (the summary
+    # materialized views); their owners recreate them on next access
+    cur.execute(sql.SQL("DROP TABLE IF EXISTS {} CASCADE;").format(sql.Identifier(table)))
+    cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {};").format(
+        sql.Identifier(staging), sql.Identifier(table)))
+    cur.execute(sql.SQL("ALTER INDEX {} RENAME TO {};").format(
+        sql.Identifier(staging_index), sql.Identifier(f"idx_{table}_{geom_col}")))
+
+    # The replacement has no triggers yet; record the change in this transaction
+    track_data_version(cur, table)
+    bump_data_version(cur, table)
+
+
+def iter_feature_chunks(paths, chunk_size):
+    """Yield GeoDataFrame chunks of at most chunk_size features from each file"""
+    import geopandas as gpd
+
+    for path in paths:
+        offset = 0
+        while True:
+            chunk = gpd.read_file(path, rows=slice(offset, offset + chunk_size))
+            if chunk.empty:
+                break
+            yield chunk
+            offset += len(chunk)
+            if len(chunk) < chunk_size:
+                break
+
+
+def bulk_load_shapefile(path=STATES_SHAPEFILE, table="us_states", chunk_size=10_000,
+                        key_column="GEOID", geom_col="geometry", profile_memory=False):
+    """Stream a shapefile into PostGIS with binary COPY and swap it in atomically
+
+    `path` may also be a list of files sharing one schema (e.g. the per-state
+    TIGER place files). Columns that exist only on the live table (such as
+    the tax rates added by update_tax_rates()) are carried over to the new
+    rows by key_column. Returns a dict with row count, rows/sec and peak
+    memory, or None on error. Peak memory is only traced with
+    profile_memory (tracemalloc slows the load down) and is None otherwise.
+    """
+    paths = [path] if isinstance(path, str) else list(path)
+    staging = f"{table}_staging"
+    if profile_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    peak_bytes = None
+
+    with get_connection() as conn:
+        if not conn:
+            if profile_memory:
+                tracemalloc.stop()
+            return None
+        try:
+            cur = conn.cursor()
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {};").format(sql.Identifier(staging)))
+
+            columns = None
+            srid = STATES_SRID
+            rows = 0
+            for chunk in iter_feature_chunks(paths, chunk_size):
+                if columns is None:
+                    columns = _column_types(chunk, geom_col)
+                    if chunk.crs is not None and chunk.crs.to_epsg():
+                        srid = chunk.crs.to_epsg()
+                    column_defs = [sql.SQL("{} " + col_type).format(sql.Identifier(name))
+                                   for name, col_type, _ in columns]
+                    column_defs.append(sql.SQL("{} geometry(MultiPolygon, {})").format(
+                        sql.Identifier(geom_col), sql.Literal(srid)))
+                    cur.execute(sql.SQL("CREATE TABLE {} ({});").format(
+                        sql.Identifier(staging), sql.SQL(", ").join(column_defs)))
+                    copy_statement = sql.SQL("COPY {} ({}) FROM STDIN (FORMAT binary)").format(
+                        sql.Identifier(staging),
+                        sql.SQL(", ").join(sql.Identifier(name) for name in
+                                           [c[0] for c in columns] + [geom_col]),
+                    ).as_string(conn)
+
+                cur.copy_expert(copy_statement, encode_copy_chunk(chunk, columns, geom_col, srid))
+                rows += len(chunk)
+                print(f"Copied {rows:,} rows into {staging}")
+
+            if columns is None:
+                print(f"No features found in {path}")
+                conn.rollback()
+                return None
+
+            loaded_columns = {c[0] for c in columns} | {geom_col}
+            carried = _carry_over_columns(cur, table, staging, loaded_columns, key_column)
+            if carried:
+                print(f"Carried over existing columns: {', '.join(carried)}")
+
+            _swap_tables(cur, table, staging, geom_col)
+            conn.commit()
+
+        except Exception as e:
+            conn.rollback()
+            print(f"Error bulk loading {path}: {e}")
+            return None
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile_memory:
+                peak_bytes = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+    stats = {
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_sec": rows / elapsed if elapsed else 0.0,
+        "peak_memory_mb": peak_bytes / 1_048_576 if peak_bytes is not None else None,
+    }
+    memory = f", peak memory {stats['peak_memory_mb']:.1f} MB" if profile_memory else ""
+    print(f"Loaded {rows:,} rows into {table} in {elapsed:.2f}s "
+          f"({stats['rows_per_sec']:,.0f} rows/sec{memory})")
+    return stats
+
+
+if __name__ == "__main__":
+    import sys
+
+    bulk_load_shapefile(profile_memory="--profile-memory" in sys.argv[1:])
@@ -0,0 +1,87 @@
+# db_pool.py
+import threading
+from contextlib import contextmanager
+
+from settings import DB_URL, DB_POOL_MIN, DB_POOL_MAX
+
+_lock = threading.Lock()
+_pool = None
+_engine = None
+
+# Pool utilization counters, reported by pool_stats()
+_stats = {
+    "checkouts": 0,
+    "in_use": 0,
+    "peak_in_use": 0,
+    "connect_errors": 0,
+}
+
+
+def get_pool():
+    """Return the shared psycopg2 connection pool, creating it on first use"""
+    global _pool
+    with _lock:
+        if _pool is None:
+            from psycopg2 import pool as pg_pool
+
+            _pool = pg_pool.ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, dsn=DB_URL)
+            print(f"Database connection pool ready ({DB_POOL_MIN}-{DB_POOL_MAX} connections)")
+    return _pool
+
+
+def get_engine():
+    """Return the shared SQLAlchemy engine used by pandas/geopandas readers"""
+    global _engine
+    with _lock:
+        if _engine is None:
+            from sqlalchemy import create_engine
+
+            _engine = create_engine(DB_URL, pool_size=DB_POOL_MAX, pool_pre_ping=True)
+    return _engine
+
+
+@contextmanager
+def get_connection():
+    """Borrow a pooled connection; yields None if the database is unreachable"""
+    try:
+        pool = get_pool()
+        conn = pool.getconn()
+    except Exception as e:
+        with _lock:
+            _stats["connect_errors"] += 1
+        print(f"Error connecting to database: {e}")
+        yield None
+        return
+
+    with _lock:
+        _stats["checkouts"] += 1
+        _stats["in_use"] += 1
+        _stats["peak_in_use"] = max(_stats["peak_in_use"], _stats["in_use"])
+    try:
+        yield conn
+    finally:
+        # putconn() rolls back any open transaction before reuse
+        pool.putconn(conn, close=bool(conn.closed))
+        with _lock:
+            _stats["in_use"] -= 1
+
+
+def pool_stats():
+    """Return pool utilization counters"""
+    with _lock:
+        stats = dict(_stats)
+    stats["max_connections"] = DB_POOL_MAX
+    stats["utilization"] = stats["in_use"] / DB_POOL_MAX if DB_POOL_MAX else 0.0
+    return stats
+
+
+def close_pool():
+    """Close every pooled connection and dispose of the engine"""
+    global _pool, _engine
+    with _lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
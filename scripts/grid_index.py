@@ -0,0 +1,125 @@
+# grid_index.py
+import numpy as np
+import shapely
+
+# Cell size in degrees; ~11 km at the equator, so few cells straddle a border
+DEFAULT_CELL_SIZE = 0.1
+
+# Cell codes in GridIndex.cells
+EMPTY_CELL = -1
+# Boundary cells are stored as BOUNDARY_BASE - position in the candidate table
+BOUNDARY_BASE = -2
+
+
+class GridIndex:
+    """Regular lon/lat grid that pre-buckets polygons for constant-time filtering
+
+    Every cell holds either the row of the single polygon that contains it
+    outright (interior cell, answered without a geometry test), EMPTY_CELL, or
+    a pointer into a CSR candidate table listing the polygons crossing it.
+    """
+
+    def __init__(self, geometries, tree=None, cell_size=DEFAULT_CELL_SIZE):
+        geometries = np.asarray(geometries, dtype=object)
+        if tree is None:
+            tree = shapely.STRtree(geometries)
+
+        minx, miny, maxx, maxy = shapely.total_bounds(geometries)
+        self.cell_size = float(cell_size)
+        self.origin_x = float(np.floor(minx / cell_size) * cell_size)
+        self.origin_y = float(np.floor(miny / cell_size) * cell_size)
+        self.nx = int(np.ceil((maxx - self.origin_x) / cell_size)) + 1
+        self.ny = int(np.ceil((maxy - self.origin_y) / cell_size)) + 1
+
+        cells = np.full(self.nx * self.ny, EMPTY_CELL, dtype=np.int32)
+        boundary_cells = []
+        boundary_candidates = []
+
+        # One grid row at a time keeps the temporary cell boxes small
+        xs = self.origin_x + np.arange(self.nx) * cell_size
+        for row in range(self.ny):
+            y = self.origin_y + row * cell_size
+            boxes = shapely.box(xs, y, xs + cell_size, y + cell_size)
+            cell_idx, geom_idx = tree.query(boxes, predicate="intersects")
+            if len(cell_idx) == 0:
+                continue
+
+            counts = np.bincount(cell_idx, minlength=self.nx)
+            single = counts[cell_idx] == 1
+            interior = np.zeros(len(cell_idx), dtype=bool)
+            interior[single] = shapely.contains_properly(
+                geometries[geom_idx[single]], boxes[cell_idx[single]])
+
+            cell_ids = row * self.nx + cell_idx
+            cells[cell_ids[interior]] = geom_idx[interior]
+            boundary_cells.append(cell_ids[~interior])
+            boundary_candidates.append(geom_idx[~interior])
+
+        # CSR layout: candidates of the k-th boundary cell are
+        # candidates[offsets[k]:offsets[k + 1]], sorted by polygon row
+        if boundary_cells:
+            boundary_cells = np.concatenate(boundary_cells)
+            boundary_candidates = np.concatenate(boundary_candidates)
+        else:
+            boundary_cells = np.array([], dtype=np.int64)
+            boundary_candidates = np.array([], dtype=np.int64)
+        order = np.lexsort((boundary_candidates, boundary_cells))
+        boundary_cells = boundary_cells[order]
+        unique_cells, starts = np.unique(boundary_cells, return_index=True)
+        cells[unique_cells] = BOUNDARY_BASE - np.arange(len(unique_cells))
+
+        self.cells = cells
+        self.offsets = np.append(starts, len(boundary_cells)).astype(np.int64)
+        self.candidates = boundary_candidates[order].astype(np.int32)
+        self.geometries = geometries
+
+    def __len__(self):
+        return len(self.cells)
+
+    def stats(self):
+        """Cell counts by kind and the mean candidate list length of boundary cells"""
+        boundary = int((self.cells <= BOUNDARY_BASE).sum())
+        return {
+            "cells": len(self.cells),
+            "interior": int((self.cells >= 0).sum()),
+            "boundary": boundary,
+            "empty": int((self.cells == EMPTY_CELL).sum()),
+            "mean_candidates": len(self.candidates) / boundary if boundary else 0.0,
+            "bytes": self.cells.nbytes + self.offsets.nbytes + self.candidates.nbytes,
+        }
+
+    def cell_codes(self, lon, lat):
+        """Return the cell code of each point (EMPTY_CELL outside the grid)"""
+        ix = np.floor((lon - self.origin_x) / self.cell_size)
+        iy = np.floor((lat - self.origin_y) / self.cell_size)
+        valid = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+        codes = np.full(len(lon), EMPTY_CELL, dtype=np.int32)
+        codes[valid] = self.cells[iy[valid].astype(np.int64) * self.nx + ix[valid].astype(np.int64)]
+        return codes
+
+    def match(self, lon, lat):
+        """Return the row of the polygon containing each point (-1 if none)
+
+        Only points in boundary cells are tested against geometry, and then
+        only against that cell's candidates; the lowest matching row wins.
+        """
+        lon = np.asarray(lon, dtype="float64")
+        lat = np.asarray(lat, dtype="float64")
+        codes = self.cell_codes(lon, lat)
+        matches = np.where(codes >= 0, codes, -1).astype(np.int64)
+
+        edge = np.flatnonzero(codes <= BOUNDARY_BASE)
+        if len(edge) == 0:
+            return matches
+
+        slot = BOUNDARY_BASE - codes[edge]
+        starts = self.offsets[slot]
+        lengths = self.offsets[slot + 1] - starts
+        point_idx = np.repeat(edge, lengths)
+        cand_pos = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        geom_idx = self.candidates[cand_pos]
+
+        hit = shapely.intersects_xy(self.geometries[geom_idx], lon[point_idx], lat[point_idx])
+        # Candidates are sorted per cell, so reversed assignment keeps the lowest row
+        matches[point_idx[hit][::-1]] = geom_idx[hit][::-1]
+        return matches
@@ -0,0 +1,142 @@
+# jurisdiction_index.py
+import time
+
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from grid_index import DEFAULT_CELL_SIZE, GridIndex
+from settings import STATES_SHAPEFILE, STATES_SRID
+
+# Attributes returned for every located point
+TEXT_COLUMNS = ["GEOID", "STATEFP", "STUSPS"]
+RATE_COLUMNS = ["sales_tax_rate", "use_tax_rate"]
+
+
+class JurisdictionIndex:
+    """In-memory point-in-jurisdiction lookup over the us_states polygons"""
+
+    def __init__(self, gdf, text_columns=TEXT_COLUMNS):
+        if gdf.crs is not None and gdf.crs.to_epsg() != STATES_SRID:
+            gdf = gdf.to_crs(epsg=STATES_SRID)
+
+        self.geometries = np.asarray(gdf.geometry.values, dtype=object)
+        shapely.prepare(self.geometries)
+        self.tree = STRtree(self.geometries)
+        self.grid = None
+
+        # Attribute arrays carry one extra trailing slot that unmatched
+        # points (index -1) resolve to, so lookups stay a single take()
+        self.attributes = {}
+        for col in text_columns:
+            values = gdf[col].to_numpy(dtype=object) if col in gdf else np.full(len(gdf), None, dtype=object)
+            self.attributes[col] = np.append(values, None)
+        for col in RATE_COLUMNS:
+            values = np.asarray(gdf[col], dtype="float64") if col in gdf else np.full(len(gdf), np.nan)
+            self.attributes[col] = np.append(values, np.nan)
+
+    def __len__(self):
+        return len(self.geometries)
+
+    @classmethod
+    def from_shapefile(cls, path=STATES_SHAPEFILE):
+        """Build the index straight from the TIGER shapefile (no tax rates)"""
+        import geopandas as gpd
+
+        return cls(gpd.read_file(path))
+
+    @classmethod
+    def from_cache(cls, source="postgis"):
+        """Build the index from the local GeoParquet cache of us_states"""
+        from layer_cache import load_states
+
+        return cls(load_states(columns=TEXT_COLUMNS + RATE_COLUMNS, source=source))
+
+    @classmethod
+    def from_postgis(cls):
+        """Build the index from the us_states table, including tax rates"""
+        import geopandas as gpd
+        from db_pool import get_engine
+
+        query = """
+            SELECT
+                "GEOID",
+                "STATEFP",
+                "STUSPS",
+                sales_tax_rate,
+                use_tax_rate,
+                geometry
+            FROM us_states;
+        """
+        return cls(gpd.read_postgis(query, get_engine(), geom_col='geometry'))
+
+    def build_grid(self, cell_size=DEFAULT_CELL_SIZE):
+        """Pre-bucket the polygons into a grid so most lookups skip geometry tests"""
+        self.grid = GridIndex(self.geometries, self.tree, cell_size)
+        return self.grid
+
+    def match_all(self, lon, lat):
+        """Return (point, polygon) position pairs for every polygon containing a point"""
+        lon = np.asarray(lon, dtype="float64")
+        lat = np.asarray(lat, dtype="float64")
+        points = shapely.points(lon, lat)
+        return self.tree.query(points, predicate="intersects")
+
+    def match(self, lon, lat):
+        """Return the row position of the polygon containing each point (-1 if none)"""
+        if self.grid is not None:
+            return self.grid.match(lon, lat)
+        point_idx, geom_idx = self.match_all(lon, lat)
+
+        # Points on a shared border hit two states; keep the first match
+        matches = np.full(np.size(lon), -1, dtype=np.int64)
+        matches[point_idx[::-1]] = geom_idx[::-1]
+        return matches
+
+    def locate_many(self, lon, lat):
+        """Resolve arrays of coordinates to GEOID/STATEFP/STUSPS and tax rates"""
+        matches = self.match(lon, lat)
+        result = {col: values[matches] for col, values in self.attributes.items()}
+        result["index"] = matches
+        return result
+
+    def locate(self, lon, lat):
+        """Resolve a single coordinate; returns None outside every jurisdiction"""
+        matches = self.match([lon], [lat])
+        if matches[0] < 0:
+            return None
+        return {col: values[matches[0]] for col, values in self.attributes.items()}
+
+
+def benchmark_lookup(index, n_points=1_000_000, seed=0):
+    """Time locate_many() over random points in the continental US"""
+    rng = np.random.default_rng(seed)
+    lon = rng.uniform(-125.0, -66.0, n_points)
+    lat = rng.uniform(24.0, 50.0, n_points)
+
+    start = time.perf_counter()
+    result = index.locate_many(lon, lat)
+    elapsed = time.perf_counter() - start
+
+    matched = int((result["index"] >= 0).sum())
+    print(f"Located {n_points:,} points in {elapsed:.3f}s "
+          f"({n_points / elapsed:,.0f} points/sec, {matched:,} matched)")
+    return elapsed
+
+
+if __name__ == "__main__":
+    print("Building jurisdiction index from shapefile...")
+    index = JurisdictionIndex.from_shapefile()
+    print(f"Indexed {len(index)} jurisdictions")
+
+    print("\nSample lookup (Sacramento, CA):")
+    print(index.locate(-121.4944, 38.5816))
+
+    print("\nBenchmarking bulk lookup...")
+    benchmark_lookup(index)
+
+    print("\nBuilding grid pre-bucketing...")
+    start = time.perf_counter()
+    grid = index.build_grid()
+    print(f"Built in {time.perf_counter() - start:.2f}s: {grid.stats()}")
+    benchmark_lookup(index)
@@ -0,0 +1,155 @@
+# jurisdiction_stack.py
+import numpy as np
+
+from jurisdiction_index import JurisdictionIndex
+from settings import JURISDICTION_LAYERS
+
+
+def read_layer_with_rates(layer, config):
+    """Read one jurisdiction layer with the rates currently in effect"""
+    import geopandas as gpd
+    from db_pool import get_engine
+
+    table = config['table']
+    if table == 'us_states':
+        # State rates live on us_states itself (see update_tax_rates())
+        query = """
+            SELECT "GEOID", "STATEFP", "STUSPS", sales_tax_rate, use_tax_rate, geometry
+            FROM us_states;
+        """
+    else:
+        query = f"""
+            SELECT
+                l."{config['rate_key']}" AS "GEOID",
+                l."STATEFP",
+                r.sales_tax_rate,
+                r.use_tax_rate,
+                l.geometry
+            FROM {table} l
+            LEFT JOIN tax_rates r
+              ON r.geoid = l."{config['rate_key']}"
+             AND r.effective_from <= CURRENT_DATE
+             AND (r.effective_to IS NULL OR r.effective_to > CURRENT_DATE);
+        """
+    return gpd.read_postgis(query, get_engine(), geom_col='geometry')
+
+
+class JurisdictionStack:
+    """Resolve points against every overlapping jurisdiction layer at once
+
+    The top (state) layer is searched first; each lower layer is split into
+    one index per state, so a point is only tested against the counties,
+    places and school districts of the state it fell in.
+    """
+
+    def __init__(self, layers, overlapping=()):
+        names = list(layers)
+        self.layer_names = names
+        self.top = JurisdictionIndex(layers[names[0]])
+        self.overlapping = set(overlapping)
+
+        # For each lower layer: top-layer row position -> index of that state's polygons
+        top_statefp = self.top.attributes["STATEFP"][:-1]
+        self.sublayers = {}
+        for name in names[1:]:
+            by_state = {statefp: JurisdictionIndex(group)
+                        for statefp, group in layers[name].groupby("STATEFP")}
+            self.sublayers[name] = [by_state.get(statefp) for statefp in top_statefp]
+
+    @classmethod
+    def from_postgis(cls, layers=JURISDICTION_LAYERS):
+        """Build the stack from every configured layer table that exists"""
+        frames = {}
+        for layer, config in layers.items():
+            try:
+                frames[layer] = read_layer_with_rates(layer, config)
+            except Exception as e:
+                if not frames:
+                    raise
+                print(f"Skipping {layer} layer: {e}")
+        overlapping = [layer for layer, config in layers.items() if config.get('overlapping')]
+        return cls(frames, overlapping)
+
+    def resolve(self, lon, lat):
+        """Return every jurisdiction containing each point and the combined rates
+
+        The result holds per-point arrays (STATEFP and combined sales/use
+        rates, NaN outside every state) plus a long-format "jurisdictions"
+        table of (point, layer, GEOID, rates) rows ordered by point and layer.
+        """
+        lon = np.asarray(lon, dtype="float64")
+        lat = np.asarray(lat, dtype="float64")
+        n = len(lon)
+
+        top_rows = self.top.match(lon, lat)
+        found = np.flatnonzero(top_rows >= 0)
+        points = [found]
+        layers = [np.zeros(len(found), dtype=np.int16)]
+        geoids = [self.top.attributes["GEOID"][top_rows[found]]]
+        sales = [self.top.attributes["sales_tax_rate"][top_rows[found]]]
+        use = [self.top.attributes["use_tax_rate"][top_rows[found]]]
+
+        # Group located points by state once, then test each state's sublayers
+        order = found[np.argsort(top_rows[found], kind="stable")]
+        states, starts = np.unique(top_rows[order], return_index=True)
+        bounds = np.append(starts, len(order))
+
+        for layer_no, name in enumerate(self.layer_names[1:], start=1):
+            indexes = self.sublayers[name]
+            for state_row, begin, end in zip(states, bounds[:-1], bounds[1:]):
+                index = indexes[state_row]
+                if index is None:
+                    continue
+                rows = order[begin:end]
+                if name in self.overlapping:
+                    point_idx, geom_idx = index.match_all(lon[rows], lat[rows])
+                else:
+                    matches = index.match(lon[rows], lat[rows])
+                    point_idx = np.flatnonzero(matches >= 0)
+                    geom_idx = matches[point_idx]
+                points.append(rows[point_idx])
+                layers.append(np.full(len(point_idx), layer_no, dtype=np.int16))
+                geoids.append(index.attributes["GEOID"][geom_idx])
+                sales.append(index.attributes["sales_tax_rate"][geom_idx])
+                use.append(index.attributes["use_tax_rate"][geom_idx])
+
+        points = np.concatenate(points)
+        layers = np.concatenate(layers)
+        sort = np.lexsort((layers, points))
+        jurisdictions = {
+            "point": points[sort],
+            "layer": np.asarray(self.layer_names, dtype=object)[layers[sort]],
+            "GEOID": np.concatenate(geoids)[sort],
+            "sales_tax_rate": np.concatenate(sales)[sort],
+            "use_tax_rate": np.concatenate(use)[sort],
+        }
+
+        combined_sales = np.zeros(n)
+        combined_use = np.zeros(n)
+        np.add.at(combined_sales, jurisdictions["point"], np.nan_to_num(jurisdictions["sales_tax_rate"]))
+        np.add.at(combined_use, jurisdictions["point"], np.nan_to_num(jurisdictions["use_tax_rate"]))
+        outside = top_rows < 0
+        combined_sales[outside] = np.nan
+        combined_use[outside] = np.nan
+
+        return {
+            "STATEFP": self.top.attributes["STATEFP"][top_rows],
+            "combined_sales_tax_rate": combined_sales,
+            "combined_use_tax_rate": combined_use,
+            "jurisdictions": jurisdictions,
+        }
+
+
+if __name__ == "__main__":
+    import time
+
+    stack = JurisdictionStack.from_postgis()
+    rng = np.random.default_rng(0)
+    lon = rng.uniform(-125.0, -66.0, 100_000)
+    lat = rng.uniform(24.0, 50.0, 100_000)
+
+    start = time.perf_counter()
+    result = stack.resolve(lon, lat)
+    elapsed = time.perf_counter() - start
+    print(f"Resolved {len(lon):,} points across {len(stack.layer_names)} layers "
+          f"in {elapsed:.3f}s ({elapsed / len(lon) * 1e6:.1f} µs/point)")
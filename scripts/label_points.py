@@ -0,0 +1,91 @@
+# label_points.py
+# numpy and shapely are imported inside the functions that use them, so
+# the database setup code importing refresh_label_points stays cheap
+from db_pool import get_connection
+from settings import STATES_SRID
+
+# SQL select expressions for the persisted label anchor; rows whose
+# label_point has not been built yet fall back to ST_PointOnSurface
+LABEL_ANCHOR_SQL = """
+    ST_X(COALESCE(label_point, ST_PointOnSurface(geometry))) AS label_x,
+    ST_Y(COALESCE(label_point, ST_PointOnSurface(geometry))) AS label_y
+"""
+
+
+def compute_label_points(geoms, method="representative"):
+    """Return (x, y) label anchors for an array of polygons
+
+    "representative" uses a point guaranteed to lie inside each geometry
+    (computed for the whole array in one call); "pole" uses the pole of
+    inaccessibility of each geometry's largest part, which sits further
+    from the border but is computed per geometry.
+    """
+    import numpy as np
+    import shapely
+
+    geoms = np.asarray(geoms, dtype=object)
+    if method == "pole":
+        from shapely.ops import polylabel
+
+        points = []
+        for geom in geoms:
+            if geom is None or geom.is_empty:
+                points.append(None)
+                continue
+            parts = shapely.get_parts(geom)
+            largest = parts[np.argmax(shapely.area(parts))]
+            points.append(polylabel(largest, tolerance=0.01))
+        points = np.asarray(points, dtype=object)
+    else:
+        points = shapely.point_on_surface(geoms)
+    # Missing or empty geometries get no anchor (NaN coordinates)
+    points = np.where(shapely.is_empty(points), None, points)
+    return shapely.get_x(points), shapely.get_y(points)
+
+
+def refresh_label_points(method="representative"):
+    """Persist a label_point column on us_states in one set-based update"""
+    expressions = {
+        "representative": "ST_PointOnSurface(geometry)",
+        "pole": "(ST_MaximumInscribedCircle(geometry)).center",
+    }
+    with get_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute(f"""
+                    ALTER TABLE us_states
+                    ADD COLUMN IF NOT EXISTS label_point geometry(Point, {STATES_SRID});
+
+                    UPDATE us_states
+                    SET label_point = {expressions[method]};
+                """)
+                conn.commit()
+                print(f"Label points refreshed ({method})")
+
+            except Exception as e:
+                conn.rollback()
+                print(f"Error refreshing label points: {e}")
+
+
+def annotate_labels(ax, xs, ys, texts, **text_kwds):
+    """Add one text label per anchor to an axis
+
+    Works on plain arrays, so labeling thousands of features avoids
+    building a pandas row and a centroid per feature.
+    """
+    import numpy as np
+
+    text_kwds.setdefault("ha", "center")
+    text_kwds.setdefault("va", "center")
+    xs = np.asarray(xs, dtype="float64")
+    ys = np.asarray(ys, dtype="float64")
+    texts = np.asarray(texts, dtype=object)
+
+    valid = np.isfinite(xs) & np.isfinite(ys)
+    return [ax.text(x, y, text, **text_kwds)
+            for x, y, text in zip(xs[valid], ys[valid], texts[valid])]
+
+
+if __name__ == "__main__":
+    refresh_label_points()
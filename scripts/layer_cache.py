@@ -0,0 +1,243 @@
+# layer_cache.py
+import hashlib
+import json
+import os
+
+from settings import CACHE_DIR, STATES_SHAPEFILE
+
+SHAPEFILE_PARTS = [".shp", ".shx", ".dbf", ".prj"]
+
+# Columns derived from the geometry in PostGIS that the cache does not keep
+DERIVED_COLUMNS_PREFIXES = ("geom_lod", "label_point")
+
+
+def cache_path(name):
+    """Path of a cached GeoParquet layer"""
+    return os.path.join(CACHE_DIR, f"{name}.parquet")
+
+
+def shapefile_version(path=STATES_SHAPEFILE, hash_contents=False):
+    """Version key of a shapefile from its parts' size and mtime (or content hash)"""
+    base, _ = os.path.splitext(path)
+    digest = hashlib.md5()
+    for ext in SHAPEFILE_PARTS:
+        part = base + ext
+        if not os.path.exists(part):
+            continue
+        if hash_contents:
+            with open(part, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        else:
+            stat = os.stat(part)
+            digest.update(f"{ext}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return f"file:{digest.hexdigest()}"
+
+
+# Per-table change counter, bumped in the writing transaction by triggers
+# (statement-level, so bulk writes cost one bump). Unlike the statistics
+# collector's counters it is transactional and survives pg_stat_reset().
+DATA_VERSION_TRIGGER = "data_version_bump"
+
+DATA_VERSION_DDL = """
+    CREATE TABLE IF NOT EXISTS data_versions (
+        table_name text PRIMARY KEY,
+        version bigint NOT NULL,
+        changed_at timestamptz NOT NULL DEFAULT now()
+    );
+
+    CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        -- Statements that touched no rows leave the version alone
+        IF TG_OP <> 'TRUNCATE' THEN
+            IF NOT EXISTS (SELECT 1 FROM changed_rows) THEN
+                RETURN NULL;
+            END IF;
+        END IF;
+        INSERT INTO data_versions (table_name, version) VALUES (TG_TABLE_NAME, 1)
+        ON CONFLICT (table_name) DO UPDATE
+        SET version = data_versions.version + 1, changed_at = now();
+        RETURN NULL;
+    END;
+    $$;
+"""
+
+
+def track_data_version(cur, table):
+    """Install the data_versions triggers on a table unless it already has them
+
+    Called where tables are created or loaded, never on the read path. The
+    data_versions table and trigger function are only created when missing.
+    """
+    cur.execute("""
+        SELECT to_regclass(%s) IS NOT NULL,
+               to_regclass('data_versions') IS NOT NULL
+                   AND to_regprocedure('bump_data_version()') IS NOT NULL,
+               EXISTS (SELECT 1 FROM pg_trigger
+                       WHERE tgrelid = to_regclass(%s) AND tgname = %s)
+    """, (table, table, f"{DATA_VERSION_TRIGGER}_insert"))
+    exists, has_versions, has_trigger = cur.fetchone()
+    if not exists or (has_versions and has_trigger):
+        return False
+
+    if not has_versions:
+        cur.execute(DATA_VERSION_DDL)
+    events = [("insert", "INSERT", "REFERENCING NEW TABLE AS changed_rows"),
+              ("update", "UPDATE", "REFERENCING NEW TABLE AS changed_rows"),
+              ("delete", "DELETE", "REFERENCING OLD TABLE AS changed_rows"),
+              ("truncate", "TRUNCATE", "")]
+    for suffix, event, referencing in events:
+        name = f"{DATA_VERSION_TRIGGER}_{suffix}"
+        cur.execute(f'DROP TRIGGER IF EXISTS {name} ON "{table}";')
+        cur.execute(f"""
+            CREATE TRIGGER {name} AFTER {event} ON "{table}"
+            {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+        """)
+    return True
+
+
+def bump_data_version(cur, table):
+    """Advance a table's data version (for writes the triggers do not see)
+
+    Plain DML: data_versions must exist, i.e. track_data_version() has run.
+    """
+    cur.execute("""
+        INSERT INTO data_versions (table_name, version) VALUES (%s, 1)
+        ON CONFLICT (table_name) DO UPDATE
+        SET version = data_versions.version + 1, changed_at = now();
+    """, (table,))
+
+
+def table_version(table="us_states"):
+    """Version key of a table: its storage file plus its data_versions counter
+
+    The relfilenode changes whenever the table is replaced (e.g. by the bulk
+    loader) and the counter with every committed insert, update or delete.
+    Read-only: the loaders and rate updates install the tracking, and a
+    table they have not touched yet reports counter 0.
+    """
+    from db_pool import get_connection
+
+    with get_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT c.relfilenode, to_regclass('data_versions') IS NOT NULL
+                    FROM pg_class c
+                    WHERE c.oid = to_regclass(%s);
+                """, (table,))
+                row = cur.fetchone()
+                version = 0
+                if row and row[1]:
+                    cur.execute("SELECT version FROM data_versions WHERE table_name = %s;", (table,))
+                    counter = cur.fetchone()
+                    version = counter[0] if counter else 0
+                conn.rollback()
+                if row:
+                    return f"table:{table}:{row[0]}:{version}"
+            except Exception as e:
+                conn.rollback()
+                print(f"Error reading version of {table}: {e}")
+    return None
+
+
+def _meta_path(path):
+    return path + ".json"
+
+
+def read_cache_meta(name):
+    """Return the sidecar metadata of a cached layer, or None"""
+    try:
+        with open(_meta_path(cache_path(name))) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_cache(gdf, name, version, extra_meta=None):
+    """Write a layer to the cache atomically along with its version key"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = cache_path(name)
+    tmp_path = path + ".tmp"
+    gdf.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+    meta = {"version": version, "rows": len(gdf), "columns": list(gdf.columns)}
+    if extra_meta:
+        meta.update(extra_meta)
+    with open(_meta_path(path) + ".tmp", "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(_meta_path(path) + ".tmp", _meta_path(path))
+
+
+def read_cache(name, columns=None):
+    """Memory-map a cached layer, reading only the requested columns it has"""
+    import geopandas as gpd
+    import pyarrow.parquet as pq
+
+    if columns is not None:
+        available = set(pq.read_schema(cache_path(name)).names)
+        columns = [col for col in columns if col in available and col != "geometry"] + ["geometry"]
+    return gpd.read_parquet(cache_path(name), columns=columns, memory_map=True)
+
+
+def _read_states_from_postgis():
+    import geopandas as gpd
+    from db_pool import get_engine
+
+    gdf = gpd.read_postgis("SELECT * FROM us_states;", get_engine(), geom_col="geometry")
+    derived = [col for col in gdf.columns if col.startswith(DERIVED_COLUMNS_PREFIXES)]
+    gdf = gdf.drop(columns=derived)
+    for col in ["sales_tax_rate", "use_tax_rate", "tax_rate"]:
+        if col in gdf:
+            gdf[col] = gdf[col].astype(float)
+    return gdf
+
+
+def states_cache_name(source):
+    return f"us_states_{source}"
+
+
+def load_states(columns=None, source="shapefile", refresh=False):
+    """Load us_states from the local GeoParquet cache, rebuilding it when stale
+
+    source="shapefile" keys the cache on the TIGER files, source="postgis"
+    on the us_states table version (and includes the tax rate columns).
+    """
+    name = states_cache_name(source)
+    if source == "postgis":
+        version = table_version("us_states")
+    else:
+        version = shapefile_version()
+
+    meta = read_cache_meta(name)
+    if version is None and meta and os.path.exists(cache_path(name)):
+        print(f"Could not check {name} freshness; using cached copy")
+        return read_cache(name, columns)
+    if (not refresh and meta and version is not None and meta.get("version") == version
+            and os.path.exists(cache_path(name))):
+        return read_cache(name, columns)
+
+    print(f"Rebuilding {name} cache...")
+    if source == "postgis":
+        gdf = _read_states_from_postgis()
+    else:
+        import geopandas as gpd
+
+        gdf = gpd.read_file(STATES_SHAPEFILE)
+    # Summary figures are stored with the cache so readers need not recompute them
+    from summary_stats import summarize_states_frame
+    write_cache(gdf, name, version, extra_meta={"summary": summarize_states_frame(gdf)})
+
+    if columns is not None:
+        keep = [col for col in gdf.columns if col in columns or col == "geometry"]
+        gdf = gdf[keep]
+    return gdf
+
+
+if __name__ == "__main__":
+    states = load_states(refresh=True)
+    print(f"Cached {len(states)} states")
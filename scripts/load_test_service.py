@@ -0,0 +1,138 @@
+# load_test_service.py
+"""Load test a running lookup_service and report throughput and tail latency
+
+Each simulated client keeps one HTTP/1.1 connection open and sends
+requests back to back for the test duration:
+
+    python lookup_service.py &
+    python load_test_service.py --concurrency 64 --duration 10
+    python load_test_service.py --batch 1000    # POST /lookup/batch instead
+
+Points are drawn uniformly over the continental US.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from settings import LOOKUP_HOST, LOOKUP_PORT
+
+
+async def _request(reader, writer, method, path, body=b""):
+    """Send one request on an open connection; returns the status code"""
+    head = (f"{method} {path} HTTP/1.1\r\nHost: lookup\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+    response = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = response.decode("latin-1").rstrip("\r\n").split("\r\n")
+    length = 0
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split(" ", 2)[1])
+
+
+def _random_point(rng):
+    return rng.uniform(-125.0, -66.0), rng.uniform(24.0, 50.0)
+
+
+async def _client(host, port, deadline, batch, seed, latencies, errors):
+    rng = random.Random(seed)
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        if writer is None:
+            reader, writer = await asyncio.open_connection(host, port)
+        if batch:
+            points = [_random_point(rng) for _ in range(batch)]
+            method, path, body = "POST", "/lookup/batch", json.dumps({"points": points}).encode()
+        else:
+            lon, lat = _random_point(rng)
+            method, path, body = "GET", f"/lookup?lon={lon:.6f}&lat={lat:.6f}", b""
+
+        start = time.perf_counter()
+        try:
+            status = await _request(reader, writer, method, path, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            errors["connection"] += 1
+            writer.close()
+            reader = writer = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            errors[status] = errors.get(status, 0) + 1
+    if writer is not None:
+        writer.close()
+
+
+async def run_load_test(host=LOOKUP_HOST, port=LOOKUP_PORT, concurrency=32, duration=10.0,
+                        batch=0, seed=0):
+    """Run the load test and return throughput and latency figures"""
+    latencies = []
+    errors = {"connection": 0}
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(
+        _client(host, port, deadline, batch, seed + i, latencies, errors)
+        for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    if not latencies:
+        return {"requests": 0, "errors": errors}
+    latencies_ms = np.asarray(latencies) * 1000.0
+    return {
+        "requests": len(latencies_ms),
+        "requests_per_sec": len(latencies_ms) / elapsed,
+        "points_per_sec": len(latencies_ms) * max(batch, 1) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p90_ms": float(np.percentile(latencies_ms, 90)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "max_ms": float(latencies_ms.max()),
+        "errors": {key: count for key, count in errors.items() if count},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=LOOKUP_HOST)
+    parser.add_argument("--port", type=int, default=LOOKUP_PORT)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--batch", type=int, default=0,
+                        help="points per POST /lookup/batch request (0 = single GET lookups)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    mode = f"batches of {args.batch:,} points" if args.batch else "single lookups"
+    print(f"Load testing http://{args.host}:{args.port} with {args.concurrency} clients "
+          f"for {args.duration:g}s ({mode})...")
+    try:
+        report = asyncio.run(run_load_test(args.host, args.port, args.concurrency, args.duration,
+                                           args.batch, args.seed))
+    except OSError as e:
+        print(f"Could not reach the lookup service: {e}")
+        return 1
+
+    if not report["requests"]:
+        print(f"No requests completed; errors: {report['errors']}")
+        return 1
+    print(f"Requests:    {report['requests']:,} ({report['requests_per_sec']:,.0f} req/s)")
+    if args.batch:
+        print(f"Points:      {report['points_per_sec']:,.0f} points/s")
+    print(f"Latency ms:  p50 {report['p50_ms']:.2f}  p90 {report['p90_ms']:.2f}  "
+          f"p99 {report['p99_ms']:.2f}  max {report['max_ms']:.2f}")
+    if report["errors"]:
+        print(f"Errors:      {report['errors']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
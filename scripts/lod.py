@@ -0,0 +1,97 @@
+# lod.py
+from db_pool import get_connection
+from settings import STATES_SRID
+
+# Simplified geometry columns on us_states, finest first,
+# as (column, simplification tolerance in degrees)
+LOD_LEVELS = [
+    ("geom_lod1", 0.005),
+    ("geom_lod2", 0.02),
+    ("geom_lod3", 0.08),
+]
+
+# TIGER states span the antimeridian (Aleutians), so a national map
+# covers roughly the full 360 degrees of longitude
+NATIONAL_EXTENT_DEG = 360.0
+TILE_SIZE_PX = 256
+
+
+def refresh_lod_geometries():
+    """(Re)build the simplified geometry columns on us_states
+
+    Uses ST_CoverageSimplify (PostGIS 3.4+) so neighbouring states keep
+    sharing their simplified borders; older PostGIS versions fall back to
+    per-state ST_SimplifyPreserveTopology.
+    """
+    with get_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT EXISTS (
+                        SELECT 1 FROM pg_proc WHERE proname = 'st_coveragesimplify'
+                    );
+                """)
+                has_coverage_simplify = cur.fetchone()[0]
+
+                for column, tolerance in LOD_LEVELS:
+                    cur.execute(f"""
+                        ALTER TABLE us_states
+                        ADD COLUMN IF NOT EXISTS {column} geometry(MultiPolygon, {STATES_SRID});
+                    """)
+                    if has_coverage_simplify:
+                        cur.execute(f"""
+                            UPDATE us_states s
+                            SET {column} = ST_Multi(c.geom)
+                            FROM (
+                                SELECT
+                                    "GEOID",
+                                    ST_CoverageSimplify(geometry, %s) OVER () AS geom
+                                FROM us_states
+                            ) c
+                            WHERE c."GEOID" = s."GEOID";
+                        """, (tolerance,))
+                    else:
+                        cur.execute(f"""
+                            UPDATE us_states
+                            SET {column} = ST_Multi(ST_SimplifyPreserveTopology(geometry, %s));
+                        """, (tolerance,))
+                    print(f"Built {column} (tolerance {tolerance}°)")
+
+                conn.commit()
+                method = "coverage" if has_coverage_simplify else "per-geometry"
+                print(f"Level-of-detail geometries refreshed ({method} simplification)")
+
+            except Exception as e:
+                conn.rollback()
+                print(f"Error building level-of-detail geometries: {e}")
+
+
+def select_lod_column(width_px, extent_deg=NATIONAL_EXTENT_DEG):
+    """Pick the coarsest geometry column whose tolerance stays under one pixel"""
+    degrees_per_px = extent_deg / width_px
+    column = "geometry"
+    for name, tolerance in LOD_LEVELS:
+        if tolerance <= degrees_per_px:
+            column = name
+    return column
+
+
+def lod_geometry_sql(width_px=None, zoom=None, extent_deg=NATIONAL_EXTENT_DEG):
+    """SQL select expression for the geometry level suited to an output size
+
+    Pass either the rendered width in pixels or a web map zoom level.
+    Falls back to full resolution for rows whose simplified geometry is
+    missing (e.g. right after a reload).
+    """
+    if zoom is not None:
+        width_px = TILE_SIZE_PX * 2 ** zoom
+        extent_deg = NATIONAL_EXTENT_DEG
+    column = select_lod_column(width_px, extent_deg)
+    if column == "geometry":
+        return "geometry"
+    return f"COALESCE({column}, geometry) AS geometry"
+
+
+if __name__ == "__main__":
+    refresh_lod_geometries()
@@ -0,0 +1,289 @@
+# lookup_service.py
+"""Local HTTP/JSON service resolving coordinates to jurisdictions and rates
+
+Lookups are answered from an in-memory JurisdictionIndex over us_states
+(with its rate columns), so consumers share one process instead of each
+opening Postgres connections:
+
+    python lookup_service.py [--host 127.0.0.1] [--port 8765]
+
+    GET  /lookup?lon=-121.4944&lat=38.5816
+    POST /lookup/batch   {"points": [[-121.4944, 38.5816], ...]}
+    GET  /health
+
+The us_states and tax_rates table versions are polled every
+RELOAD_INTERVAL seconds; when either changes a new index is built in a
+worker thread and swapped in. Requests already running keep the index
+they started with.
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from settings import LOOKUP_HOST, LOOKUP_PORT
+
+# Seconds between checks of the us_states / tax_rates versions
+RELOAD_INTERVAL = 30.0
+MAX_BATCH_POINTS = 100_000
+# Batches at least this large are resolved off the event loop
+EXECUTOR_BATCH_POINTS = 5_000
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def source_version():
+    """Versions of the tables the index is built from (None values if unreachable)"""
+    from layer_cache import table_version
+
+    return {"us_states": table_version("us_states"), "tax_rates": table_version("tax_rates")}
+
+
+def build_index():
+    """Build the lookup index from the us_states cache, with grid pre-bucketing"""
+    from jurisdiction_index import JurisdictionIndex
+
+    index = JurisdictionIndex.from_cache(source="postgis")
+    index.build_grid()
+    return index
+
+
+def _json_value(value):
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+def resolve_points(index, lon, lat):
+    """Per-point result dicts from the index, None outside every jurisdiction"""
+    result = index.locate_many(lon, lat)
+    matches = result.pop("index")
+    columns = {col: values.tolist() for col, values in result.items()}
+    return [
+        {col: _json_value(values[i]) for col, values in columns.items()} if matches[i] >= 0 else None
+        for i in range(len(matches))
+    ]
+
+
+def _parse_coordinate(query, name):
+    try:
+        value = float(query[name][0])
+    except (KeyError, ValueError):
+        raise HTTPError(400, f"query parameter '{name}' must be a number")
+    if not math.isfinite(value):
+        raise HTTPError(400, f"query parameter '{name}' must be finite")
+    return value
+
+
+def _parse_batch(body):
+    """Split a {"points": [[lon, lat], ...]} body into lon and lat lists"""
+    try:
+        points = json.loads(body)["points"]
+        lon = [float(point[0]) for point in points]
+        lat = [float(point[1]) for point in points]
+    except (ValueError, KeyError, TypeError, IndexError):
+        raise HTTPError(400, 'body must be {"points": [[lon, lat], ...]}')
+    if len(points) > MAX_BATCH_POINTS:
+        raise HTTPError(413, f"at most {MAX_BATCH_POINTS:,} points per batch")
+    return lon, lat
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+class LookupService:
+    """Serves lookups from the current index snapshot and hot-swaps it on data changes
+
+    The snapshot is a dict replaced as a whole (never mutated), so each
+    request reads one consistent index, version pair.
+    """
+
+    def __init__(self, reload_interval=RELOAD_INTERVAL):
+        self.reload_interval = reload_interval
+        self.snapshot = None
+        self.requests = 0
+        self.reloads = 0
+        self._reload_task = None
+
+    async def start(self):
+        await self.reload()
+        self._reload_task = asyncio.create_task(self._reload_loop())
+
+    async def stop(self):
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+            try:
+                await self._reload_task
+            except asyncio.CancelledError:
+                pass
+            self._reload_task = None
+
+    async def reload(self, version=None):
+        """Build a new index in a worker thread and swap it in"""
+        loop = asyncio.get_running_loop()
+        if version is None:
+            version = await loop.run_in_executor(None, source_version)
+        start = time.perf_counter()
+        index = await loop.run_in_executor(None, build_index)
+        self.snapshot = {"index": index, "version": version, "loaded_at": time.time()}
+        self.reloads += 1
+        print(f"Lookup index loaded: {len(index)} jurisdictions in {time.perf_counter() - start:.2f}s")
+
+    async def _reload_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                version = await loop.run_in_executor(None, source_version)
+                # An unreachable database keeps the current index in service
+                if version["us_states"] is None or version == self.snapshot["version"]:
+                    continue
+                print("us_states or tax_rates changed; rebuilding lookup index")
+                await self.reload(version)
+            except Exception as e:
+                print(f"Error reloading lookup index: {e}")
+
+    async def lookup(self, query):
+        lon = _parse_coordinate(query, "lon")
+        lat = _parse_coordinate(query, "lat")
+        snapshot = self._current()
+        return {"lon": lon, "lat": lat, "jurisdiction": resolve_points(snapshot["index"], [lon], [lat])[0]}
+
+    async def lookup_batch(self, body):
+        lon, lat = _parse_batch(body)
+        snapshot = self._current()
+        if len(lon) >= EXECUTOR_BATCH_POINTS:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(None, resolve_points, snapshot["index"], lon, lat)
+        else:
+            results = resolve_points(snapshot["index"], lon, lat)
+        return {"results": results}
+
+    def health(self):
+        snapshot = self._current()
+        return {
+            "status": "ok",
+            "jurisdictions": len(snapshot["index"]),
+            "version": snapshot["version"],
+            "loaded_at": snapshot["loaded_at"],
+            "reloads": self.reloads,
+            "requests": self.requests,
+        }
+
+    def _current(self):
+        if self.snapshot is None:
+            raise HTTPError(503, "index not loaded yet")
+        return self.snapshot
+
+    async def dispatch(self, method, target, body):
+        """Route one request; returns (status, JSON payload)"""
+        self.requests += 1
+        url = urlsplit(target)
+        try:
+            if url.path == "/lookup":
+                if method != "GET":
+                    raise HTTPError(405, "use GET /lookup?lon=&lat=")
+                return 200, await self.lookup(parse_qs(url.query))
+            if url.path == "/lookup/batch":
+                if method != "POST":
+                    raise HTTPError(405, "use POST /lookup/batch")
+                return 200, await self.lookup_batch(body)
+            if url.path == "/health":
+                return 200, self.health()
+            raise HTTPError(404, f"no route for {url.path}")
+        except HTTPError as e:
+            return e.status, {"error": e.message}
+        except Exception as e:
+            print(f"Error handling {method} {url.path}: {e}")
+            return 500, {"error": "internal error"}
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until either side closes it"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ", 2)
+                except ValueError:
+                    writer.write(_response(400, {"error": "malformed request line"}, False))
+                    break
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", "0") or 0)
+                if length > MAX_BODY_BYTES:
+                    writer.write(_response(413, {"error": "request body too large"}, False))
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def serve(host=LOOKUP_HOST, port=LOOKUP_PORT, reload_interval=RELOAD_INTERVAL):
+    """Load the index, then serve until cancelled"""
+    service = LookupService(reload_interval)
+    await service.start()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"Lookup service listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def run_service(host=LOOKUP_HOST, port=LOOKUP_PORT, reload_interval=RELOAD_INTERVAL):
+    try:
+        asyncio.run(serve(host, port, reload_interval))
+    except KeyboardInterrupt:
+        print("Lookup service stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=LOOKUP_HOST)
+    parser.add_argument("--port", type=int, default=LOOKUP_PORT)
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL)
+    args = parser.parse_args()
+    run_service(args.host, args.port, args.reload_interval)
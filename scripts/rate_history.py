@@ -0,0 +1,104 @@
+# rate_history.py
+import numpy as np
+
+from db_pool import get_connection
+
+# Interval keys pack (jurisdiction code, day) into one int64 so a single
+# searchsorted finds the latest interval starting on or before a date
+DAY_OFFSET = 2 ** 31
+CODE_STRIDE = 2 ** 32
+OPEN_END = np.iinfo(np.int64).max
+
+
+def _to_days(dates):
+    """Convert dates (date objects, strings or datetime64) to int64 day numbers"""
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+class RateHistory:
+    """In-memory sorted-interval index of effective-dated tax rates"""
+
+    def __init__(self, geoids, effective_from, effective_to, sales_tax_rate, use_tax_rate):
+        geoids = np.asarray(geoids, dtype=str)
+        self.geoids, codes = np.unique(geoids, return_inverse=True)
+
+        starts = _to_days(effective_from)
+        ends = np.asarray(effective_to, dtype="datetime64[D]")
+        ends = np.where(np.isnat(ends), OPEN_END, ends.astype(np.int64))
+
+        keys = codes.astype(np.int64) * CODE_STRIDE + starts + DAY_OFFSET
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.codes = codes[order]
+        self.ends = ends[order]
+        self.sales_tax_rate = np.asarray(sales_tax_rate, dtype="float64")[order]
+        self.use_tax_rate = np.asarray(use_tax_rate, dtype="float64")[order]
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_postgis(cls):
+        """Load the full rate history from the tax_rates table"""
+        with get_connection() as conn:
+            if conn is None:
+                raise ConnectionError("Database unavailable for rate history")
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT geoid, effective_from, effective_to, sales_tax_rate, use_tax_rate
+                FROM tax_rates;
+            """)
+            rows = cur.fetchall()
+
+        if not rows:
+            empty = np.array([], dtype=object)
+            return cls(empty, empty, empty, empty, empty)
+        geoids, starts, ends, sales, use = zip(*rows)
+        ends = [np.datetime64("NaT") if end is None else end for end in ends]
+        return cls(geoids, starts, ends, sales, use)
+
+    def lookup(self, geoids, dates):
+        """Return the interval position for each (geoid, date) pair, -1 if none"""
+        geoids = np.asarray(geoids, dtype=str)
+        days = _to_days(dates)
+        if len(self.keys) == 0:
+            return np.full(len(geoids), -1, dtype=np.int64)
+
+        pos = np.searchsorted(self.geoids, geoids)
+        pos = np.minimum(pos, len(self.geoids) - 1)
+        known = self.geoids[pos] == geoids
+
+        query_keys = pos.astype(np.int64) * CODE_STRIDE + days + DAY_OFFSET
+        idx = np.searchsorted(self.keys, query_keys, side="right") - 1
+        safe_idx = np.maximum(idx, 0)
+
+        valid = (known & (idx >= 0)
+                 & (self.codes[safe_idx] == pos)
+                 & (days < self.ends[safe_idx]))
+        return np.where(valid, idx, -1)
+
+    def rates_at(self, geoids, dates):
+        """Vectorized rate lookup; NaN where no rate was in effect"""
+        idx = self.lookup(geoids, dates)
+        found = idx >= 0
+        sales = np.full(len(idx), np.nan)
+        use = np.full(len(idx), np.nan)
+        sales[found] = self.sales_tax_rate[idx[found]]
+        use[found] = self.use_tax_rate[idx[found]]
+        return {"sales_tax_rate": sales, "use_tax_rate": use}
+
+    def rate_at(self, geoid, date):
+        """Rates in effect for one jurisdiction on one date, or None"""
+        idx = self.lookup([geoid], [date])[0]
+        if idx < 0:
+            return None
+        return {
+            "sales_tax_rate": float(self.sales_tax_rate[idx]),
+            "use_tax_rate": float(self.use_tax_rate[idx]),
+        }
+
+
+if __name__ == "__main__":
+    history = RateHistory.from_postgis()
+    print(f"Loaded {len(history):,} rate intervals for {len(history.geoids):,} jurisdictions")
+    print(history.rate_at("06", "2024-06-30"))
@@ -0,0 +1,260 @@
+# rate_transactions.py
+"""Rate a large transactions file (CSV or Parquet) against the jurisdiction layer
+
+Rows are read in fixed-size chunks, located in a pool of worker processes
+and written as Parquet part files next to a manifest, so memory stays
+bounded and an interrupted run resumes from the last completed chunk:
+
+    python rate_transactions.py transactions.csv output/ --lon-column lon --lat-column lat
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from jurisdiction_index import RATE_COLUMNS, TEXT_COLUMNS, JurisdictionIndex
+
+# Leading underscore: dataset readers skip it when reading output_dir as Parquet
+MANIFEST_NAME = "_manifest.json"
+OUTPUT_COLUMNS = TEXT_COLUMNS + RATE_COLUMNS
+
+# Worker-process state, set up once by _init_worker()
+_index = None
+
+
+def _init_worker(source, use_grid):
+    """Build the worker's index from the GeoParquet cache alone
+
+    The parent has already refreshed the cache; reading it directly keeps
+    the workers off the database entirely.
+    """
+    from layer_cache import read_cache, states_cache_name
+
+    global _index
+    _index = JurisdictionIndex(read_cache(states_cache_name(source), columns=OUTPUT_COLUMNS))
+    if use_grid:
+        _index.build_grid()
+
+
+def _locate_chunk(lon, lat):
+    result = _index.locate_many(lon, lat)
+    return {col: result[col] for col in OUTPUT_COLUMNS}
+
+
+def input_fingerprint(path, chunk_size):
+    """Identify an input file and chunking so a resume never mixes two inputs"""
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "chunk_size": chunk_size,
+    }
+
+
+def read_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(output_dir, manifest):
+    """Write the manifest atomically so a crash never leaves it half-written"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+# A plain decimal or scientific number; anything else in a coordinate column is null
+NUMBER_PATTERN = r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$"
+
+
+def _coerce_float(batch, columns):
+    """Convert string columns of a batch to float64, unparseable values to null"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    arrays = []
+    for name, array in zip(batch.schema.names, batch.columns):
+        if name in columns:
+            array = pc.utf8_trim_whitespace(array)
+            numeric = pc.match_substring_regex(array, NUMBER_PATTERN)
+            array = pc.cast(pc.if_else(numeric, array, pa.scalar(None, pa.string())), pa.float64())
+        arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+
+def iter_chunks(path, chunk_size, columns=None, float_columns=()):
+    """Yield pyarrow Tables of at most chunk_size rows, read incrementally
+
+    CSV float_columns are read as text and converted per batch, blanks and
+    non-numeric values becoming nulls, instead of being typed from the
+    first block (which makes a later block fail mid-stream).
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+
+    if path.lower().endswith((".parquet", ".pq")):
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns)
+    else:
+        convert = pacsv.ConvertOptions(include_columns=columns,
+                                       column_types={col: pa.string() for col in float_columns})
+        reader = pacsv.open_csv(path, convert_options=convert)
+        batches = (_coerce_float(batch, float_columns) for batch in reader)
+
+    # Re-slice the reader's batches into exact chunk_size tables so chunk
+    # numbers stay stable between runs (needed for resume)
+    pending = []
+    pending_rows = 0
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunk_size:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, chunk_size)
+            rest = table.slice(chunk_size)
+            pending = rest.to_batches()
+            pending_rows = rest.num_rows
+    if pending_rows:
+        yield pa.Table.from_batches(pending)
+
+
+def _write_part(output_dir, chunk_no, table, located, history=None, dates=None):
+    """Append the located columns to a chunk and write it as one Parquet part"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if history is not None:
+        rates = history.rates_at(located["GEOID"].astype(str), dates)
+        located = dict(located, **rates)
+
+    for col in OUTPUT_COLUMNS:
+        values = located[col]
+        array = pa.array(values, type=pa.string()) if col in TEXT_COLUMNS else pa.array(values, type=pa.float64())
+        if col in table.column_names:
+            table = table.drop_columns([col])
+        table = table.append_column(col, array)
+
+    name = f"part-{chunk_no:05d}.parquet"
+    path = os.path.join(output_dir, name)
+    pq.write_table(table, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return name
+
+
+def rate_transactions(input_path, output_dir, lon_column="lon", lat_column="lat",
+                      date_column=None, chunk_size=500_000, workers=None,
+                      source="postgis", use_grid=True, restart=False):
+    """Resolve every row of input_path to its jurisdiction and tax rates
+
+    With date_column, rates are taken from the effective-dated tax_rates
+    history for each row's date rather than the current state rates.
+    Returns a dict with row counts and throughput.
+    """
+    from db_pool import close_pool
+    from layer_cache import load_states
+
+    os.makedirs(output_dir, exist_ok=True)
+    fingerprint = input_fingerprint(input_path, chunk_size)
+    manifest = None if restart else read_manifest(output_dir)
+    if manifest is None or manifest.get("input") != fingerprint:
+        if manifest is not None:
+            print("Input changed since the last run; starting over")
+        manifest = {"input": fingerprint, "parts": [], "complete": False}
+    done = len(manifest["parts"])
+    if manifest["complete"]:
+        print(f"{input_path} already rated ({done} parts in {output_dir})")
+        return {"rows": sum(p["rows"] for p in manifest["parts"]), "rows_per_sec": None}
+    if done:
+        print(f"Resuming after chunk {done - 1} ({sum(p['rows'] for p in manifest['parts']):,} rows done)")
+
+    history = None
+    if date_column:
+        from rate_history import RateHistory
+        history = RateHistory.from_postgis()
+
+    # Refresh the shared cache once so the workers only read it
+    load_states(columns=OUTPUT_COLUMNS, source=source)
+    # Forked workers must not inherit open libpq connections
+    close_pool()
+
+    start = time.perf_counter()
+    rows = 0
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(source, use_grid)) as pool:
+        in_flight = deque()
+
+        def finish_oldest():
+            nonlocal rows
+            chunk_no, table, future = in_flight.popleft()
+            dates = table.column(date_column).to_numpy() if date_column else None
+            name = _write_part(output_dir, chunk_no, table, future.result(), history, dates)
+            manifest["parts"].append({"chunk": chunk_no, "file": name, "rows": table.num_rows})
+            write_manifest(output_dir, manifest)
+            rows += table.num_rows
+            elapsed = time.perf_counter() - start
+            print(f"Chunk {chunk_no}: {table.num_rows:,} rows ({rows / elapsed:,.0f} rows/s)")
+
+        chunks = iter_chunks(input_path, chunk_size, float_columns=(lon_column, lat_column))
+        for chunk_no, table in enumerate(chunks):
+            if chunk_no < done:
+                continue
+            lon = np.asarray(table.column(lon_column).to_numpy(), dtype="float64")
+            lat = np.asarray(table.column(lat_column).to_numpy(), dtype="float64")
+            in_flight.append((chunk_no, table, pool.submit(_locate_chunk, lon, lat)))
+            # At most two chunks per worker are held in memory
+            if len(in_flight) >= 2 * workers:
+                finish_oldest()
+        while in_flight:
+            finish_oldest()
+
+    manifest["complete"] = True
+    write_manifest(output_dir, manifest)
+
+    elapsed = time.perf_counter() - start
+    stats = {"rows": rows, "seconds": elapsed, "rows_per_sec": rows / elapsed if elapsed else None}
+    print(f"Rated {rows:,} rows in {elapsed:.2f}s ({stats['rows_per_sec'] or 0:,.0f} rows/s)")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="transactions file (.csv or .parquet)")
+    parser.add_argument("output_dir", help="directory for Parquet parts and the manifest")
+    parser.add_argument("--lon-column", default="lon")
+    parser.add_argument("--lat-column", default="lat")
+    parser.add_argument("--date-column", help="rate each row as of this date column")
+    parser.add_argument("--chunk-size", type=int, default=500_000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--source", choices=["postgis", "shapefile"], default="postgis",
+                        help="where the cached us_states layer comes from")
+    parser.add_argument("--no-grid", action="store_true", help="skip the grid pre-bucketing")
+    parser.add_argument("--restart", action="store_true", help="ignore any previous progress")
+    args = parser.parse_args(argv)
+
+    rate_transactions(
+        args.input, args.output_dir,
+        lon_column=args.lon_column,
+        lat_column=args.lat_column,
+        date_column=args.date_column,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        source=args.source,
+        use_grid=not args.no_grid,
+        restart=args.restart,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+# rate_zones.py
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import shapely
+
+from db_pool import get_connection
+from settings import JURISDICTION_LAYERS, STATES_SRID
+
+ZONES_TABLE = "rate_zones"
+ZONE_COLUMNS = ["zone_id", "STATEFP", "geoids", "sales_tax_rate", "use_tax_rate"]
+
+
+def create_rate_zone_tables(cur):
+    """Create the rate_zones table and the per-state build log"""
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS rate_zones (
+            zone_id text PRIMARY KEY,
+            "STATEFP" text NOT NULL,
+            geoids text NOT NULL,  -- contributing GEOIDs, top layer first, ';'-separated
+            sales_tax_rate double precision,
+            use_tax_rate double precision,
+            geometry geometry(MultiPolygon, {STATES_SRID})
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_rate_zones_geometry
+            ON rate_zones USING GIST (geometry);
+        CREATE INDEX IF NOT EXISTS idx_rate_zones_statefp
+            ON rate_zones ("STATEFP");
+
+        CREATE TABLE IF NOT EXISTS rate_zone_builds (
+            statefp text PRIMARY KEY,
+            input_hash text NOT NULL,
+            zone_count integer NOT NULL,
+            built_at timestamptz NOT NULL DEFAULT now()
+        );
+    """)
+
+
+def _state_inputs(frames):
+    """Split every layer frame into {STATEFP: {layer: rows of that state}}"""
+    states = {}
+    for layer, gdf in frames.items():
+        for statefp, group in gdf.groupby("STATEFP"):
+            states.setdefault(statefp, {})[layer] = group[
+                ["GEOID", "sales_tax_rate", "use_tax_rate", "geometry"]].reset_index(drop=True)
+    return states
+
+
+def state_input_hash(layers):
+    """Content hash of one state's inputs: every layer's GEOIDs, rates and geometry"""
+    digest = hashlib.md5()
+    for layer in sorted(layers):
+        gdf = layers[layer].sort_values("GEOID", kind="stable")
+        digest.update(layer.encode())
+        digest.update("\0".join(gdf["GEOID"].astype(str)).encode())
+        digest.update(np.asarray(gdf["sales_tax_rate"], dtype="float64").tobytes())
+        digest.update(np.asarray(gdf["use_tax_rate"], dtype="float64").tobytes())
+        for wkb in shapely.to_wkb(gdf.geometry.values):
+            digest.update(wkb)
+    return digest.hexdigest()
+
+
+def build_state_zones(statefp, layers, layer_order):
+    """Planar overlay of one state's layers into disjoint rate zones
+
+    All polygon boundaries are noded together and polygonized into faces;
+    each face's interior point is then matched against every layer, and
+    faces with the same set of contributing jurisdictions are merged.
+    """
+    import geopandas as gpd
+
+    layer_order = [name for name in layer_order if name in layers]
+    geoms = np.concatenate([layers[name].geometry.values for name in layer_order])
+    linework = shapely.union_all(shapely.boundary(geoms))
+    faces = shapely.get_parts(shapely.polygonize(shapely.get_parts(linework)))
+    points = shapely.point_on_surface(faces)
+
+    keys = [[] for _ in range(len(faces))]
+    sales = np.zeros(len(faces))
+    use = np.zeros(len(faces))
+    inside = np.zeros(len(faces), dtype=bool)
+    for layer_no, name in enumerate(layer_order):
+        gdf = layers[name]
+        tree = shapely.STRtree(gdf.geometry.values)
+        face_idx, geom_idx = tree.query(points, predicate="within")
+        order = np.lexsort((geom_idx, face_idx))
+        face_idx, geom_idx = face_idx[order], geom_idx[order]
+
+        geoids = gdf["GEOID"].to_numpy(dtype=object)
+        np.add.at(sales, face_idx, np.nan_to_num(np.asarray(gdf["sales_tax_rate"], dtype="float64")[geom_idx]))
+        np.add.at(use, face_idx, np.nan_to_num(np.asarray(gdf["use_tax_rate"], dtype="float64")[geom_idx]))
+        for face, geom in zip(face_idx, geom_idx):
+            keys[face].append(geoids[geom])
+        if layer_no == 0:
+            # Faces outside the top layer (holes between states) are not zones
+            inside[face_idx] = True
+
+    faces_gdf = gpd.GeoDataFrame({
+        "geoids": [";".join(key) for key in keys],
+        "sales_tax_rate": sales,
+        "use_tax_rate": use,
+    }, geometry=faces, crs=f"EPSG:{STATES_SRID}")[inside]
+
+    zones = faces_gdf.dissolve(by="geoids", aggfunc="first", as_index=False)
+    zones = zones.sort_values("geoids", kind="stable").reset_index(drop=True)
+    zones.insert(0, "STATEFP", statefp)
+    zones.insert(0, "zone_id", [f"{statefp}-{i:05d}" for i in range(len(zones))])
+    return zones[ZONE_COLUMNS + ["geometry"]]
+
+
+def _build_state(args):
+    statefp, layers, layer_order = args
+    return statefp, build_state_zones(statefp, layers, layer_order)
+
+
+def _stored_hashes(cur):
+    cur.execute("SELECT statefp, input_hash FROM rate_zone_builds;")
+    return dict(cur.fetchall())
+
+
+def _write_state_zones(cur, zones, hashes):
+    """Replace the zones of the rebuilt states and record their input hashes"""
+    from bulk_loader import _encode_double, _encode_text, encode_copy_chunk
+
+    statefps = list(hashes)
+    cur.execute('DELETE FROM rate_zones WHERE "STATEFP" = ANY(%s);', (statefps,))
+    if len(zones):
+        columns = [
+            ("zone_id", "text", _encode_text),
+            ("STATEFP", "text", _encode_text),
+            ("geoids", "text", _encode_text),
+            ("sales_tax_rate", "double precision", _encode_double),
+            ("use_tax_rate", "double precision", _encode_double),
+        ]
+        buf = encode_copy_chunk(zones, columns, "geometry", STATES_SRID)
+        cur.copy_expert(
+            'COPY rate_zones (zone_id, "STATEFP", geoids, sales_tax_rate, use_tax_rate, geometry) '
+            "FROM STDIN WITH (FORMAT binary)", buf)
+
+    counts = zones.groupby("STATEFP").size() if len(zones) else {}
+    cur.execute("""
+        INSERT INTO rate_zone_builds (statefp, input_hash, zone_count)
+        SELECT * FROM unnest(%s::text[], %s::text[], %s::int[])
+        ON CONFLICT (statefp) DO UPDATE
+        SET input_hash = EXCLUDED.input_hash,
+            zone_count = EXCLUDED.zone_count,
+            built_at = now();
+    """, (statefps, [hashes[s] for s in statefps], [int(counts.get(s, 0)) for s in statefps]))
+
+
+def _read_zones_from_postgis():
+    import geopandas as gpd
+    from db_pool import get_engine
+
+    return gpd.read_postgis(f"SELECT * FROM {ZONES_TABLE};", get_engine(), geom_col="geometry")
+
+
+def _refresh_zone_cache(rebuilt, removed, version):
+    """Update the local GeoParquet copy of rate_zones for the rebuilt states only"""
+    import geopandas as gpd
+    import pandas as pd
+    from layer_cache import cache_path, read_cache, write_cache
+
+    if os.path.exists(cache_path(ZONES_TABLE)):
+        cached = read_cache(ZONES_TABLE)
+        keep = ~cached["STATEFP"].isin(list(rebuilt) + list(removed))
+        zones = pd.concat([cached[keep]] + list(rebuilt.values()), ignore_index=True)
+    else:
+        zones = _read_zones_from_postgis()
+    zones = gpd.GeoDataFrame(zones, geometry="geometry", crs=f"EPSG:{STATES_SRID}")
+    write_cache(zones.sort_values("zone_id").reset_index(drop=True), ZONES_TABLE, version)
+
+
+def build_rate_zones(layers=JURISDICTION_LAYERS, force=False, workers=None):
+    """Build (or incrementally refresh) the rate_zones overlay
+
+    Each state's inputs are hashed; only states whose hash differs from the
+    last build are overlaid again, in parallel worker processes.
+    Returns a dict of build statistics, or None on error.
+    """
+    import pandas as pd
+    from jurisdiction_stack import read_layer_with_rates
+    from layer_cache import read_cache_meta
+
+    start = time.perf_counter()
+    frames = {}
+    for layer, config in layers.items():
+        try:
+            frames[layer] = read_layer_with_rates(layer, config)
+        except Exception as e:
+            if not frames:
+                print(f"Error reading {layer} layer: {e}")
+                return None
+            print(f"Skipping {layer} layer: {e}")
+    layer_order = list(frames)
+    states = _state_inputs(frames)
+    top_states = set(frames[layer_order[0]]["STATEFP"])
+    hashes = {statefp: state_input_hash(inputs)
+              for statefp, inputs in states.items() if statefp in top_states}
+
+    with get_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                create_rate_zone_tables(cur)
+                stored = _stored_hashes(cur)
+                changed = [s for s in sorted(hashes) if force or stored.get(s) != hashes[s]]
+                removed = [s for s in stored if s not in hashes]
+
+                rebuilt = {}
+                if changed:
+                    tasks = [(s, states[s], layer_order) for s in changed]
+                    with ProcessPoolExecutor(max_workers=workers) as pool:
+                        for statefp, zones in pool.map(_build_state, tasks):
+                            rebuilt[statefp] = zones
+
+                    zones = pd.concat(rebuilt.values(), ignore_index=True)
+                    _write_state_zones(cur, zones, {s: hashes[s] for s in changed})
+                if removed:
+                    cur.execute('DELETE FROM rate_zones WHERE "STATEFP" = ANY(%s);', (removed,))
+                    cur.execute("DELETE FROM rate_zone_builds WHERE statefp = ANY(%s);", (removed,))
+                if changed or removed:
+                    cur.execute("ANALYZE rate_zones;")
+                conn.commit()
+
+                version = hashlib.md5("".join(hashes[s] for s in sorted(hashes)).encode()).hexdigest()
+                meta = read_cache_meta(ZONES_TABLE)
+                if changed or removed or not meta or meta.get("version") != f"zones:{version}":
+                    _refresh_zone_cache(rebuilt, removed, f"zones:{version}")
+
+                stats = {
+                    "states": len(hashes),
+                    "rebuilt": len(changed),
+                    "removed": len(removed),
+                    "zones": sum(len(z) for z in rebuilt.values()),
+                    "seconds": time.perf_counter() - start,
+                }
+                print(f"Rate zones: rebuilt {stats['rebuilt']} of {stats['states']} states "
+                      f"({stats['zones']:,} zones) in {stats['seconds']:.2f}s")
+                return stats
+
+            except Exception as e:
+                conn.rollback()
+                print(f"Error building rate zones: {e}")
+    return None
+
+
+def load_rate_zone_index(source="cache"):
+    """JurisdictionIndex over the rate zones: every point hits exactly one zone
+
+    source="cache" reads the local GeoParquet copy, "postgis" the table.
+    """
+    from jurisdiction_index import JurisdictionIndex
+    from layer_cache import read_cache
+
+    if source == "cache":
+        zones = read_cache(ZONES_TABLE)
+    else:
+        zones = _read_zones_from_postgis()
+    return JurisdictionIndex(zones, text_columns=["zone_id", "STATEFP", "geoids"])
+
+
+if __name__ == "__main__":
+    import sys
+
+    build_rate_zones(force="--force" in sys.argv[1:])
+    index = load_rate_zone_index()
+    print(f"Loaded {len(index):,} rate zones")
+    print(index.locate(-118.25, 34.05))
@@ -0,0 +1,131 @@
+# render_cache.py
+"""Skip re-rendering outputs whose data and style are unchanged
+
+Each output file is recorded in data/cache/render_cache.json with the key
+it was rendered from: a hash of the renderer name, the content of the
+query result and the style parameters. A renderer asks is_current()
+before drawing and calls record() after saving; hits and misses are
+counted for report(). set_force(True) re-renders everything.
+"""
+import hashlib
+import json
+import os
+
+from settings import CACHE_DIR, PROJECT_ROOT
+
+RENDER_CACHE_PATH = os.path.join(CACHE_DIR, "render_cache.json")
+
+# Bump when the drawing code changes so existing outputs are redrawn
+RENDER_CACHE_VERSION = 2
+
+_force = False
+_hits = []
+_misses = []
+
+
+def set_force(force=True):
+    """Make is_current() report every output as stale; returns the previous setting"""
+    global _force
+    previous, _force = _force, bool(force)
+    return previous
+
+
+def frame_hash(df):
+    """Content hash of a (Geo)DataFrame: columns, dtypes, values and geometries"""
+    import numpy as np
+    import pandas as pd
+    import shapely
+
+    digest = hashlib.md5()
+    digest.update(json.dumps([[str(name), str(dtype)] for name, dtype in df.dtypes.items()]).encode())
+
+    geometry_columns = [name for name, dtype in df.dtypes.items() if dtype == "geometry"]
+    attributes = df.drop(columns=geometry_columns)
+    if len(attributes.columns):
+        digest.update(pd.util.hash_pandas_object(attributes, index=False).to_numpy().tobytes())
+    for name in geometry_columns:
+        for wkb in shapely.to_wkb(np.asarray(df[name].values, dtype=object)):
+            digest.update(wkb if wkb is not None else b"\0")
+    return digest.hexdigest()
+
+
+def render_key(name, data_hash, style=None):
+    """Cache key of one render: renderer name, data content hash and style"""
+    payload = {"version": RENDER_CACHE_VERSION, "renderer": name, "data": data_hash, "style": style or {}}
+    return hashlib.md5(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _entry_name(path):
+    return os.path.relpath(os.path.abspath(path), PROJECT_ROOT)
+
+
+def read_render_cache():
+    try:
+        with open(RENDER_CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_render_cache(cache):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(RENDER_CACHE_PATH + ".tmp", "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(RENDER_CACHE_PATH + ".tmp", RENDER_CACHE_PATH)
+
+
+def _output_current(entry, path, key):
+    """The file exists, was rendered from key and has not been rewritten since"""
+    if not entry or entry.get("key") != key:
+        return False
+    try:
+        return os.stat(path).st_mtime_ns == entry.get("mtime_ns")
+    except OSError:
+        return False
+
+
+def is_current(name, key, outputs, force=False):
+    """True when every output was rendered from key and is still on disk
+
+    Always False with force (or after set_force()). Counts a hit or a miss
+    for `name` either way.
+    """
+    cache = read_render_cache()
+    current = not (force or _force) and all(
+        _output_current(cache.get(_entry_name(path)), path, key) for path in outputs
+    )
+    if current:
+        _hits.append(name)
+        print(f"[render cache] {name}: up to date, skipping")
+    else:
+        _misses.append(name)
+    return current
+
+
+def record(key, outputs):
+    """Remember that outputs were just rendered from key"""
+    cache = read_render_cache()
+    for path in outputs:
+        if os.path.exists(path):
+            cache[_entry_name(path)] = {"key": key, "mtime_ns": os.stat(path).st_mtime_ns}
+    write_render_cache(cache)
+
+
+def cache_stats():
+    """Names of the renders skipped (hits) and redrawn (misses) so far"""
+    return {"hits": list(_hits), "misses": list(_misses)}
+
+
+def reset_stats():
+    _hits.clear()
+    _misses.clear()
+
+
+def report():
+    """Print the hit/miss counts since the last reset"""
+    total = len(_hits) + len(_misses)
+    if not total:
+        return
+    print(f"\nRender cache: {len(_hits)} hit(s), {len(_misses)} miss(es) of {total}")
+    if _misses:
+        print(f"  redrawn: {', '.join(_misses)}")
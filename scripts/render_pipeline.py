@@ -0,0 +1,303 @@
+# render_pipeline.py
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import shapely
+
+from label_points import LABEL_ANCHOR_SQL, annotate_labels, compute_label_points
+from lod import lod_geometry_sql
+from render_cache import frame_hash, is_current, record, render_key
+from settings import DOCUMENTATION_DIR
+from streaming import read_geodataframe
+from vector_tiles import MAX_ZOOM, TILE_DIR, TILE_LAYER, build_vector_tiles
+
+# Finest web zoom level the exported maps are drawn for
+EXPORT_LOD_ZOOM = 6
+
+RATE_COLUMNS = ['sales_tax_rate', 'use_tax_rate']
+
+# Colour scale of the interactive map when no state has a rate yet
+DEFAULT_RATE_DOMAIN = (0.0, 10.0)
+
+# Label anchors keyed by geometry version, reused across renders
+_label_cache = {}
+
+
+def fetch_tax_rate_layer():
+    """Fetch names, tax rates and render-level geometry for every state once"""
+    query = f"""
+        SELECT
+            "GEOID",
+            "NAME",
+            "STUSPS",
+            sales_tax_rate,
+            use_tax_rate,
+            {LABEL_ANCHOR_SQL},
+            {lod_geometry_sql(zoom=EXPORT_LOD_ZOOM)}
+        FROM us_states;
+    """
+    gdf = read_geodataframe(query)
+    for col in RATE_COLUMNS:
+        gdf[col] = gdf[col].astype(float)
+    return gdf
+
+
+def export_key(name, data_hash, tiles_url=None):
+    """Render-cache key of one export output drawn from fetch_tax_rate_layer()
+
+    visualization.visualize_tax_rates() writes tax_rates_map.png under the
+    same key, so either path reuses the other's render. Only the
+    interactive map depends on tiles_url.
+    """
+    style = {'lod_zoom': EXPORT_LOD_ZOOM}
+    if tiles_url is not None:
+        style['tiles_url'] = tiles_url
+    return render_key(name, data_hash, style)
+
+
+def geometry_version(gdf):
+    """Content hash of a layer's geometries (missing ones hash as a sentinel)"""
+    digest = hashlib.md5()
+    for wkb in shapely.to_wkb(np.asarray(gdf.geometry.values, dtype=object)):
+        digest.update(wkb if wkb is not None else b"\0")
+    return digest.hexdigest()
+
+
+def label_anchors(gdf):
+    """Return (x, y) label anchor arrays, computed once per geometry version"""
+    # Prefer the anchors persisted in us_states.label_point
+    if 'label_x' in gdf and 'label_y' in gdf:
+        return gdf['label_x'].to_numpy(dtype=float), gdf['label_y'].to_numpy(dtype=float)
+
+    version = geometry_version(gdf)
+    if version not in _label_cache:
+        _label_cache[version] = compute_label_points(gdf.geometry.values)
+    return _label_cache[version]
+
+
+def _plot_rate_axes(gdf, axes, titles, anchors=None, fontsize=8):
+    """Draw the sales/use tax choropleths onto a pair of axes"""
+    labels = [('sales_tax_rate', 'Sales Tax Rate (%)'), ('use_tax_rate', 'Use Tax Rate (%)')]
+    for ax, title, (column, legend_label) in zip(axes, titles, labels):
+        gdf.plot(column=column,
+                 cmap='YlOrRd',
+                 legend=True,
+                 legend_kwds={'label': legend_label},
+                 ax=ax)
+        if anchors is not None:
+            xs, ys = anchors
+            annotate_labels(ax, xs, ys, gdf['STUSPS'], fontsize=fontsize)
+        ax.set_title(title)
+        ax.axis('off')
+
+
+def render_labeled_rates(gdf, anchors, outputs):
+    """Build the labeled sales/use tax figure once and save it to every output"""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(20, 10))
+    axes = fig.subplots(1, 2)
+    _plot_rate_axes(gdf, axes, ['Sales Tax Rates by State', 'Use Tax Rates by State'], anchors)
+    fig.tight_layout()
+    for path in outputs:
+        if path.endswith('.svg'):
+            fig.savefig(path, format='svg', bbox_inches='tight')
+        else:
+            fig.savefig(path, dpi=300, bbox_inches='tight')
+
+
+def render_tax_rates_map(gdf, outputs):
+    """Build the unlabeled sales/use tax overview figure"""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(15, 8))
+    axes = fig.subplots(1, 2)
+    _plot_rate_axes(gdf, axes, ['Sales Tax Rates', 'Use Tax Rates'])
+    fig.tight_layout()
+    for path in outputs:
+        fig.savefig(path)
+
+
+# Hover and click handlers for the tile layer: highlight the state and
+# show its rates, read from the tile feature properties
+_TILE_EVENTS_JS = """
+{% macro script(this, kwargs) %}
+    (function() {
+        var layer = {{ this.layer.get_name() }};
+        var map = {{ this._parent.get_name() }};
+        var highlighted = null;
+        var tooltip = L.tooltip();
+        var describe = function(p) {
+            return '<b>' + p.NAME + '</b><br>Sales Tax: ' + p.sales_tax_rate
+                + '<br>Use Tax: ' + p.use_tax_rate;
+        };
+        layer.on('mouseover', function(e) {
+            if (highlighted !== null) { layer.resetFeatureStyle(highlighted); }
+            highlighted = e.layer.properties.GEOID;
+            layer.setFeatureStyle(highlighted, {{ this.highlight }});
+            map.openTooltip(tooltip.setLatLng(e.latlng).setContent(describe(e.layer.properties)));
+        });
+        layer.on('mouseout', function() {
+            if (highlighted !== null) { layer.resetFeatureStyle(highlighted); }
+            highlighted = null;
+            map.closeTooltip(tooltip);
+        });
+    })();
+{% endmacro %}
+"""
+
+
+def write_interactive_html(gdf, path, tile_dir=TILE_DIR, tiles_url=None):
+    """Write the folium tax rate map drawn from the vector tile pyramid
+
+    Only the per-state colours are embedded; geometry comes from the
+    tiles (see vector_tiles.py). tiles_url is the {z}/{x}/{y} URL template
+    of the tiles, by default tile_dir relative to the HTML file. Browsers
+    do not fetch tiles from file:// URLs, so that default only works when
+    the folder is served over HTTP.
+    """
+    import branca.colormap as cm
+    import folium
+    from branca.element import MacroElement, Template
+    from folium.plugins import VectorGridProtobuf
+
+    # Create base map
+    m = folium.Map(location=[39.8283, -98.5795], zoom_start=4)
+
+    rates = gdf['sales_tax_rate'].to_numpy(dtype=float)
+    finite = rates[np.isfinite(rates)]
+    low, high = (float(finite.min()), float(finite.max())) if len(finite) else DEFAULT_RATE_DOMAIN
+    # A one-value scale cannot be interpolated
+    if high <= low:
+        high = low + 1.0
+    colormap = cm.linear.YlOrRd_09.scale(low, high)
+    colormap.caption = 'Sales Tax Rate (%)'
+    colors = {geoid: colormap(rate) if not np.isnan(rate) else '#cccccc'
+              for geoid, rate in zip(gdf['GEOID'], rates)}
+
+    if tiles_url is None:
+        tiles_dir = os.path.relpath(tile_dir, os.path.dirname(os.path.abspath(path))).replace(os.sep, '/')
+        tiles_url = f'{tiles_dir}/{{z}}/{{x}}/{{y}}.pbf'
+    # Options are passed as JavaScript so the style can be a function
+    options = f"""{{
+        "vectorTileLayerStyles": {{
+            "{TILE_LAYER}": (function() {{
+                var colors = {json.dumps(colors)};
+                return function(properties, zoom) {{
+                    return {{fill: true, fillColor: colors[properties.GEOID] || '#cccccc',
+                             fillOpacity: 0.7, color: '#000000', weight: 0.2, opacity: 1}};
+                }};
+            }})()
+        }},
+        "interactive": true,
+        "maxNativeZoom": {MAX_ZOOM},
+        "getFeatureId": function(feature) {{ return feature.properties.GEOID; }}
+    }}"""
+    layer = VectorGridProtobuf(tiles_url, 'Sales Tax Rates', options)
+    layer.add_to(m)
+    colormap.add_to(m)
+
+    events = MacroElement()
+    events._template = Template(_TILE_EVENTS_JS)
+    events.layer = layer
+    events.highlight = json.dumps({'fill': True, 'fillColor': '#000000', 'fillOpacity': 0.5,
+                                   'color': '#000000', 'weight': 0.5})
+    m.add_child(events)
+
+    m.save(path)
+
+
+def write_excel(gdf, path):
+    """Write the tax rate table to Excel"""
+    tax_data = gdf[['NAME', 'STUSPS', 'sales_tax_rate', 'use_tax_rate']]
+    tax_data.to_excel(path, index=False)
+
+
+def _run_task(task):
+    """Run one writer task and return (name, seconds); executed in workers"""
+    name, func, args = task
+    start = time.perf_counter()
+    func(*args)
+    return name, time.perf_counter() - start
+
+
+def run_export_pipeline(output_dir=DOCUMENTATION_DIR, workers=0, force=False, tiles_url=None):
+    """Fetch the tax rate layer once and fan it out to every export format
+
+    With workers > 0 the figures and writers run in separate processes.
+    Writers whose outputs are current in the render cache are skipped;
+    force runs every writer and rebuilds every vector tile. tiles_url
+    overrides the tile URL template of the interactive map (see
+    write_interactive_html()).
+    Returns a dict of per-stage timings in seconds.
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    gdf = fetch_tax_rate_layer()
+    timings['fetch'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    anchors = label_anchors(gdf)
+    timings['label_anchors'] = time.perf_counter() - start
+
+    def out(name):
+        return os.path.join(output_dir, name)
+
+    # The interactive map reads its geometry from these tiles
+    start = time.perf_counter()
+    tile_dir = out('tiles')
+    if build_vector_tiles(tile_dir, force=force) is None:
+        print("Warning: vector tiles not updated; the interactive map may be stale")
+    timings['vector_tiles'] = time.perf_counter() - start
+
+    labeled_outputs = [out('tax_rates_labeled.png'), out('tax_rates_vector.svg')]
+    tasks = [
+        ('labeled_figure', render_labeled_rates, (gdf, anchors, labeled_outputs), labeled_outputs),
+        ('tax_rates_map', render_tax_rates_map, (gdf, [out('tax_rates_map.png')]),
+         [out('tax_rates_map.png')]),
+        ('interactive_html', write_interactive_html,
+         (gdf, out('tax_rates_interactive.html'), tile_dir, tiles_url),
+         [out('tax_rates_interactive.html')]),
+        ('excel', write_excel, (gdf, out('tax_rates_summary.xlsx')), [out('tax_rates_summary.xlsx')]),
+    ]
+
+    # Writers whose outputs were already rendered from this exact layer are skipped
+    start = time.perf_counter()
+    data_hash = frame_hash(gdf)
+    pending = []
+    for name, func, args, outputs in tasks:
+        key = export_key(name, data_hash, tiles_url if name == 'interactive_html' else None)
+        if not is_current(name, key, outputs, force=force):
+            pending.append(((name, func, args), key, outputs))
+    timings['cache_check'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if workers and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_run_task, [task for task, _, _ in pending]))
+    else:
+        results = [_run_task(task) for task, _, _ in pending]
+    timings.update(results)
+    timings['writers_total'] = time.perf_counter() - start
+
+    # Recorded here rather than in the workers so only one process writes the manifest
+    for _, key, outputs in pending:
+        record(key, outputs)
+
+    if tiles_url is None:
+        print(f"The interactive map loads its tiles over HTTP; view it with "
+              f"python -m http.server -d {output_dir}")
+
+    print("\nExport pipeline timings:")
+    for stage, seconds in timings.items():
+        print(f"  {stage}: {seconds:.2f}s")
+    return timings
+
+
+if __name__ == "__main__":
+    run_export_pipeline()
@@ -0,0 +1,136 @@
+# state_metrics.py
+from concurrent.futures import ThreadPoolExecutor
+
+from db_pool import get_connection
+from settings import DB_POOL_MAX, DB_POOL_WORKERS
+
+# Geometry version of each state; ALAND is included since area_km2 derives from it
+STATE_HASH_SQL = """md5(COALESCE("ALAND"::text, '') || encode(ST_AsEWKB(geometry), 'hex'))"""
+
+# Columns for joining state_metrics back onto us_states rows
+STATE_METRICS_COLUMNS = """
+    m.perimeter_km,
+    m.area_km2,
+    m.boundary_points,
+    m.complexity_index
+"""
+
+
+def create_state_metrics_table():
+    """Create the state_metrics table keyed by state GEOID"""
+    with get_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS state_metrics (
+                        geoid text PRIMARY KEY,
+                        geom_hash text NOT NULL,
+                        perimeter_km double precision,
+                        area_km2 double precision,
+                        boundary_points integer,
+                        complexity_index double precision,
+                        computed_at timestamptz NOT NULL DEFAULT now()
+                    );
+                """)
+                conn.commit()
+
+            except Exception as e:
+                print(f"Error creating state_metrics table: {e}")
+
+
+def _stale_geoids(force=False):
+    """GEOIDs whose geometry changed since their metrics were computed"""
+    with get_connection() as conn:
+        if conn is None:
+            raise ConnectionError("Database unavailable for state metrics")
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT s."GEOID"
+            FROM us_states s
+            LEFT JOIN state_metrics m ON m.geoid = s."GEOID"
+            WHERE %(force)s OR m.geom_hash IS DISTINCT FROM {STATE_HASH_SQL}
+            ORDER BY ST_NPoints(s.geometry) DESC;
+        """, {"force": force})
+        stale = [row[0] for row in cur.fetchall()]
+
+        # Drop metrics of states that no longer exist
+        cur.execute("""
+            DELETE FROM state_metrics m
+            WHERE NOT EXISTS (SELECT 1 FROM us_states s WHERE s."GEOID" = m.geoid);
+        """)
+        conn.commit()
+        return stale
+
+
+def _compute_metrics(geoids):
+    """Compute and upsert the metrics of one batch of states on its own connection"""
+    with get_connection() as conn:
+        if conn is None:
+            raise ConnectionError("Database unavailable for state metrics")
+        try:
+            cur = conn.cursor()
+            cur.execute(f"""
+                INSERT INTO state_metrics (
+                    geoid, geom_hash, perimeter_km, area_km2,
+                    boundary_points, complexity_index, computed_at
+                )
+                SELECT
+                    "GEOID",
+                    {STATE_HASH_SQL},
+                    p.perimeter_km,
+                    "ALAND"/1000000.0,
+                    ST_NPoints(geometry),
+                    p.perimeter_km / NULLIF(SQRT("ALAND"/1000000.0), 0),
+                    now()
+                FROM us_states
+                CROSS JOIN LATERAL (
+                    SELECT ST_Perimeter(geometry::geography)/1000 AS perimeter_km
+                ) p
+                WHERE "GEOID" = ANY(%s)
+                ON CONFLICT (geoid) DO UPDATE
+                SET geom_hash = EXCLUDED.geom_hash,
+                    perimeter_km = EXCLUDED.perimeter_km,
+                    area_km2 = EXCLUDED.area_km2,
+                    boundary_points = EXCLUDED.boundary_points,
+                    complexity_index = EXCLUDED.complexity_index,
+                    computed_at = EXCLUDED.computed_at;
+            """, (geoids,))
+            conn.commit()
+            return cur.rowcount
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def refresh_state_metrics(force=False, workers=DB_POOL_WORKERS):
+    """Recompute boundary metrics only for states whose geometry changed
+
+    Stale states are split into batches computed concurrently, each on its
+    own pooled connection; workers is capped below the pool size so other
+    connections stay available. Returns the number of states recomputed,
+    or None on error.
+    """
+    create_state_metrics_table()
+    try:
+        stale = _stale_geoids(force)
+        if not stale:
+            return 0
+
+        # Stale states are sorted by vertex count; dealing them out
+        # round-robin gives every batch a similar share of the work
+        workers = max(1, min(workers, DB_POOL_MAX - 1, len(stale)))
+        batches = [stale[i::workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            computed = sum(pool.map(_compute_metrics, batches))
+
+        print(f"State metrics refreshed for {computed} changed states")
+        return computed
+
+    except Exception as e:
+        print(f"Error refreshing state metrics: {e}")
+    return None
+
+
+if __name__ == "__main__":
+    refresh_state_metrics()
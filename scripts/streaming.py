@@ -0,0 +1,108 @@
+# streaming.py
+import itertools
+from contextlib import contextmanager
+
+from db_pool import get_connection
+from settings import STATES_SRID
+
+# Rows fetched per round trip from a server-side cursor
+DEFAULT_ITERSIZE = 2_000
+
+# PostgreSQL type OID of numeric; converted to float rather than Decimal
+NUMERIC_OID = 1700
+
+_cursor_ids = itertools.count()
+
+
+@contextmanager
+def _borrow(conn):
+    """Use the caller's connection, or borrow a pooled one for the duration"""
+    if conn is not None:
+        yield conn
+        return
+    with get_connection() as pooled:
+        if pooled is None:
+            raise ConnectionError("Database unavailable for streaming read")
+        yield pooled
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _stream(conn, query, params, itersize):
+    """Yield (description, rows) batches from a named (server-side) cursor"""
+    with conn.cursor(name=f"stream_{next(_cursor_ids)}") as cur:
+        cur.itersize = itersize
+        cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(itersize)
+            if not rows:
+                break
+            yield cur.description, rows
+
+
+def iter_rows(query, params=None, itersize=DEFAULT_ITERSIZE, conn=None):
+    """Yield lists of at most itersize rows without materializing the full result"""
+    with _borrow(conn) as conn:
+        for _, rows in _stream(conn, query, params, itersize):
+            yield rows
+
+
+def _result_columns(conn, query, params):
+    """Column names and type OIDs of a query, from a LIMIT 0 probe"""
+    cur = conn.cursor()
+    cur.execute(f"SELECT * FROM ({query.rstrip().rstrip(';')}) q LIMIT 0;", params)
+    return [(col.name, col.type_code) for col in cur.description]
+
+
+def _to_geodataframe(columns, rows, geom_col, srid):
+    import geopandas as gpd
+    import numpy as np
+    import pandas as pd
+    import shapely
+
+    names = [name for name, _ in columns]
+    df = pd.DataFrame.from_records(rows, columns=names)
+    for name, type_code in columns:
+        if type_code == NUMERIC_OID:
+            df[name] = df[name].astype(float)
+
+    # Geometries arrive as WKB (bytea -> memoryview) and are parsed in one call
+    wkb = np.array([None if value is None else bytes(value) for value in df[geom_col]], dtype=object)
+    df[geom_col] = shapely.from_wkb(wkb)
+    return gpd.GeoDataFrame(df, geometry=geom_col, crs=f"EPSG:{srid}")
+
+
+def iter_geodataframes(query, params=None, itersize=DEFAULT_ITERSIZE, geom_col="geometry",
+                       srid=STATES_SRID, conn=None):
+    """Stream a query as GeoDataFrame chunks of at most itersize rows
+
+    The query is wrapped so geom_col travels as binary WKB (ST_AsBinary)
+    instead of hex EWKB text, and read through a named cursor so only one
+    chunk is held in client memory at a time.
+    """
+    with _borrow(conn) as conn:
+        columns = _result_columns(conn, query, params)
+        select = ", ".join(
+            f"ST_AsBinary(q.{_quote(name)}) AS {_quote(name)}" if name == geom_col else f"q.{_quote(name)}"
+            for name, _ in columns
+        )
+        wrapped = f"SELECT {select} FROM ({query.rstrip().rstrip(';')}) q"
+        for _, rows in _stream(conn, wrapped, params, itersize):
+            yield _to_geodataframe(columns, rows, geom_col, srid)
+
+
+def read_geodataframe(query, params=None, itersize=DEFAULT_ITERSIZE, geom_col="geometry",
+                      srid=STATES_SRID, conn=None):
+    """Read a whole query through iter_geodataframes() into one GeoDataFrame"""
+    import geopandas as gpd
+    import pandas as pd
+
+    chunks = list(iter_geodataframes(query, params, itersize, geom_col, srid, conn))
+    if not chunks:
+        with _borrow(conn) as conn:
+            names = [name for name, _ in _result_columns(conn, query, params)]
+        return gpd.GeoDataFrame(columns=names, geometry=geom_col, crs=f"EPSG:{srid}")
+    return gpd.GeoDataFrame(pd.concat(chunks, ignore_index=True), geometry=geom_col,
+                            crs=f"EPSG:{srid}")
@@ -0,0 +1,203 @@
+# summary_stats.py
+import json
+import os
+from decimal import Decimal
+
+from db_pool import get_connection
+from settings import CACHE_DIR
+
+SUMMARY_VIEWS = ["region_summary", "national_summary"]
+SUMMARY_CACHE_PATH = os.path.join(CACHE_DIR, "summary_stats.json")
+
+# Land-area weighted rate over the rows that have a rate
+_WEIGHTED_RATE_SQL = """
+    SUM({col} * "ALAND") / NULLIF(SUM("ALAND") FILTER (WHERE {col} IS NOT NULL), 0)
+"""
+
+VIEW_DEFINITIONS = {
+    "region_summary": f"""
+        SELECT
+            "REGION" AS region,
+            COUNT(*) AS state_count,
+            SUM("ALAND")/1000000.0 AS total_area_km2,
+            AVG("ALAND")/1000000.0 AS avg_area_km2,
+            AVG(sales_tax_rate) AS avg_sales_tax_rate,
+            AVG(use_tax_rate) AS avg_use_tax_rate,
+            {_WEIGHTED_RATE_SQL.format(col="sales_tax_rate")} AS weighted_sales_tax_rate,
+            {_WEIGHTED_RATE_SQL.format(col="use_tax_rate")} AS weighted_use_tax_rate
+        FROM us_states
+        GROUP BY "REGION"
+    """,
+    "national_summary": f"""
+        SELECT
+            'US'::text AS scope,
+            COUNT(*) AS state_count,
+            SUM("ALAND")/1000000.0 AS total_area_km2,
+            AVG("ALAND")/1000000.0 AS avg_area_km2,
+            (ARRAY_AGG("NAME" ORDER BY "ALAND" DESC))[1] AS largest_state,
+            (ARRAY_AGG("NAME" ORDER BY "ALAND" ASC))[1] AS smallest_state,
+            AVG(sales_tax_rate) AS avg_sales_tax_rate,
+            AVG(use_tax_rate) AS avg_use_tax_rate,
+            {_WEIGHTED_RATE_SQL.format(col="sales_tax_rate")} AS weighted_sales_tax_rate,
+            {_WEIGHTED_RATE_SQL.format(col="use_tax_rate")} AS weighted_use_tax_rate
+        FROM us_states
+    """,
+}
+
+# REFRESH ... CONCURRENTLY needs a unique index on each view
+VIEW_KEYS = {"region_summary": "region", "national_summary": "scope"}
+
+# In-process copy of the summaries, keyed by us_states version
+_cache = {}
+
+
+def create_summary_views(cur):
+    """Create the summary materialized views (and their refresh log) if missing
+
+    The bulk loader replaces us_states with DROP ... CASCADE, which drops
+    these views too; they are recreated here on the next access.
+    """
+    from tax_rates import ensure_rate_columns
+
+    ensure_rate_columns(cur)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS summary_refreshes (
+            view_name text PRIMARY KEY,
+            source_version text NOT NULL,
+            refreshed_at timestamptz NOT NULL DEFAULT now()
+        );
+    """)
+    for view, definition in VIEW_DEFINITIONS.items():
+        cur.execute("SELECT to_regclass(%s) IS NULL;", (view,))
+        if cur.fetchone()[0]:
+            cur.execute(f"CREATE MATERIALIZED VIEW {view} AS {definition} WITH DATA;")
+            cur.execute(f"CREATE UNIQUE INDEX idx_{view}_key ON {view} ({VIEW_KEYS[view]});")
+            # A fresh view starts unrecorded so its first refresh is logged
+            cur.execute("DELETE FROM summary_refreshes WHERE view_name = %s;", (view,))
+
+
+def refresh_summary_views(version=None, force=False):
+    """Refresh the summary views concurrently, only when us_states changed
+
+    `version` is the us_states table version (layer_cache.table_version)
+    the views should reflect. Returns the list of refreshed views, or None
+    on error.
+    """
+    from layer_cache import table_version
+
+    with get_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                create_summary_views(cur)
+                conn.commit()
+
+                version = version or table_version("us_states")
+                cur.execute("SELECT view_name, source_version FROM summary_refreshes;")
+                refreshed_for = dict(cur.fetchall())
+
+                refreshed = []
+                for view in SUMMARY_VIEWS:
+                    if not force and refreshed_for.get(view) == version:
+                        continue
+                    # CONCURRENTLY keeps the view readable while it refreshes
+                    cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view};")
+                    cur.execute("""
+                        INSERT INTO summary_refreshes (view_name, source_version)
+                        VALUES (%s, %s)
+                        ON CONFLICT (view_name) DO UPDATE
+                        SET source_version = EXCLUDED.source_version,
+                            refreshed_at = now();
+                    """, (view, version))
+                    refreshed.append(view)
+                conn.commit()
+                if refreshed:
+                    print(f"Refreshed summary views: {', '.join(refreshed)}")
+                return refreshed
+
+            except Exception as e:
+                conn.rollback()
+                print(f"Error refreshing summary views: {e}")
+    return None
+
+
+def _read_disk_cache():
+    try:
+        with open(SUMMARY_CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_disk_cache(entry):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(SUMMARY_CACHE_PATH + ".tmp", "w") as f:
+        json.dump(entry, f, indent=2)
+    os.replace(SUMMARY_CACHE_PATH + ".tmp", SUMMARY_CACHE_PATH)
+
+
+def _fetch_summaries():
+    summaries = {}
+    with get_connection() as conn:
+        if conn is None:
+            raise ConnectionError("Database unavailable for summary statistics")
+        cur = conn.cursor()
+        for view in SUMMARY_VIEWS:
+            cur.execute(f"SELECT * FROM {view} ORDER BY {VIEW_KEYS[view]};")
+            names = [col.name for col in cur.description]
+            summaries[view] = [
+                {name: float(value) if isinstance(value, Decimal) else value
+                 for name, value in zip(names, row)}
+                for row in cur.fetchall()
+            ]
+    return summaries
+
+
+def get_summary(view="region_summary"):
+    """Rows of a summary view as dicts, served from cache while us_states is unchanged
+
+    The views are refreshed first when us_states changed since their last
+    refresh. When the database cannot be reached, the last copy written to
+    data/cache/summary_stats.json is returned.
+    """
+    from layer_cache import table_version
+
+    version = table_version("us_states")
+    if version is None:
+        disk = _read_disk_cache()
+        if disk:
+            print("Could not check summary freshness; using cached copy")
+            return disk["summaries"][view]
+        return []
+
+    if version not in _cache:
+        disk = _read_disk_cache()
+        if disk and disk.get("version") == version:
+            _cache.clear()
+            _cache[version] = disk["summaries"]
+        else:
+            refresh_summary_views(version)
+            summaries = _fetch_summaries()
+            _cache.clear()
+            _cache[version] = summaries
+            _write_disk_cache({"version": version, "summaries": summaries})
+    return _cache[version][view]
+
+
+def summarize_states_frame(states):
+    """National summary of a states (Geo)DataFrame, matching national_summary"""
+    area_km2 = states["ALAND"].astype(float) / 1_000_000
+    return {
+        "state_count": int(len(states)),
+        "total_area_km2": float(area_km2.sum()),
+        "avg_area_km2": float(area_km2.mean()),
+        "largest_state": str(states.loc[area_km2.idxmax(), "NAME"]),
+        "smallest_state": str(states.loc[area_km2.idxmin(), "NAME"]),
+    }
+
+
+if __name__ == "__main__":
+    refresh_summary_views()
+    for row in get_summary("region_summary"):
+        print(row)
+    print(get_summary("national_summary"))
@@ -0,0 +1,271 @@
+# tax_rates.py
+import io
+import os
+import time
+from datetime import date
+
+from db_pool import get_connection
+
+# Sample state rates used by the setup functions in database_utils
+SAMPLE_STATE_RATES = {
+    'California': 7.25,
+    'New York': 4.00,
+    'Texas': 6.25,
+    'Florida': 6.00,
+    'Illinois': 6.25,
+}
+DEFAULT_SAMPLE_RATE = 5.00
+SAMPLE_EFFECTIVE_FROM = date(2023, 1, 1)
+
+RATE_FILE_COLUMNS = ['geoid', 'effective_from', 'effective_to', 'sales_tax_rate', 'use_tax_rate']
+
+
+def create_tax_rates_table(cur):
+    """Create the effective-dated tax_rates table keyed by jurisdiction GEOID"""
+    from layer_cache import track_data_version
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS tax_rates (
+            geoid text NOT NULL,
+            effective_from date NOT NULL,
+            effective_to date,  -- exclusive; NULL while the rate is current
+            sales_tax_rate numeric(6,3),
+            use_tax_rate numeric(6,3),
+            PRIMARY KEY (geoid, effective_from)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_tax_rates_current
+            ON tax_rates (geoid) WHERE effective_to IS NULL;
+    """)
+    track_data_version(cur, "tax_rates")
+
+
+def ensure_rate_columns(cur, with_tax_rate=False):
+    """Add the rate columns to us_states if they are missing
+
+    The columns are looked up first: ALTER TABLE takes an ACCESS EXCLUSIVE
+    lock even when every column already exists, which would block readers
+    of us_states on each refresh.
+    """
+    columns = ["sales_tax_rate", "use_tax_rate"] + (["tax_rate"] if with_tax_rate else [])
+    cur.execute("""
+        SELECT a.attname
+        FROM pg_attribute a
+        WHERE a.attrelid = to_regclass('us_states')
+          AND a.attname = ANY(%s)
+          AND NOT a.attisdropped;
+    """, (columns,))
+    existing = {row[0] for row in cur.fetchall()}
+    missing = [col for col in columns if col not in existing]
+    if not missing:
+        return
+    cur.execute(
+        "ALTER TABLE us_states "
+        + ", ".join(f"ADD COLUMN IF NOT EXISTS {col} numeric(4,2)" for col in missing)
+        + ";"
+    )
+
+
+def _create_staging(cur, staging="tax_rates_staging"):
+    """Create the temporary staging table rates are merged from
+
+    line numbers staged rows in arrival order (file order for COPY), so
+    when a file repeats a (geoid, effective_from) pair the last row wins.
+    """
+    cur.execute(f"""
+        CREATE TEMP TABLE {staging} (LIKE tax_rates, line bigserial) ON COMMIT DROP;
+    """)
+
+
+def _close_superseded_rates(cur, staging="tax_rates_staging"):
+    """End each open rate interval where a newer rate for the same GEOID starts"""
+    cur.execute(f"""
+        UPDATE tax_rates t
+        SET effective_to = n.next_from
+        FROM (
+            SELECT
+                geoid,
+                effective_from,
+                lead(effective_from) OVER (PARTITION BY geoid ORDER BY effective_from) AS next_from
+            FROM tax_rates
+            WHERE geoid IN (SELECT geoid FROM {staging})
+        ) n
+        WHERE t.geoid = n.geoid
+          AND t.effective_from = n.effective_from
+          AND n.next_from IS NOT NULL
+          AND (t.effective_to IS NULL OR t.effective_to > n.next_from);
+    """)
+
+
+def _merge_staging(cur, staging="tax_rates_staging"):
+    """Upsert staged rates into tax_rates, writing only rows whose values differ
+
+    A staged open-ended rate equal to the open interval it would follow
+    (the same rate restated with a later effective_from, as monthly files
+    do) is skipped rather than closing that interval and opening an
+    identical one. Of staged rows repeating a (geoid, effective_from) pair,
+    the last one staged is merged.
+    """
+    cur.execute(f"""
+        WITH merged AS (
+            INSERT INTO tax_rates (geoid, effective_from, effective_to, sales_tax_rate, use_tax_rate)
+            SELECT DISTINCT ON (geoid, effective_from)
+                geoid, effective_from, effective_to, sales_tax_rate, use_tax_rate
+            FROM {staging} s
+            WHERE NOT EXISTS (
+                SELECT 1
+                FROM (
+                    SELECT effective_to, sales_tax_rate, use_tax_rate
+                    FROM tax_rates t
+                    WHERE t.geoid = s.geoid
+                      AND t.effective_from < s.effective_from
+                    ORDER BY t.effective_from DESC
+                    LIMIT 1
+                ) latest
+                WHERE latest.effective_to IS NULL
+                  AND s.effective_to IS NULL
+                  AND (latest.sales_tax_rate, latest.use_tax_rate)
+                      IS NOT DISTINCT FROM (s.sales_tax_rate, s.use_tax_rate)
+            )
+            ORDER BY geoid, effective_from, line DESC
+            ON CONFLICT (geoid, effective_from) DO UPDATE
+            SET effective_to = EXCLUDED.effective_to,
+                sales_tax_rate = EXCLUDED.sales_tax_rate,
+                use_tax_rate = EXCLUDED.use_tax_rate
+            WHERE (tax_rates.effective_to, tax_rates.sales_tax_rate, tax_rates.use_tax_rate)
+                IS DISTINCT FROM
+                  (EXCLUDED.effective_to, EXCLUDED.sales_tax_rate, EXCLUDED.use_tax_rate)
+            RETURNING 1
+        )
+        SELECT COUNT(*) FROM merged;
+    """)
+    changed = cur.fetchone()[0]
+    _close_superseded_rates(cur, staging)
+    return changed
+
+
+def apply_current_rates(cur, as_of=None):
+    """Copy the rates in effect on `as_of` onto us_states, touching only changed rows"""
+    from layer_cache import track_data_version
+
+    ensure_rate_columns(cur)
+    # Bumps the us_states data version in this transaction if any row changes
+    track_data_version(cur, "us_states")
+    cur.execute("""
+        UPDATE us_states s
+        SET sales_tax_rate = ROUND(r.sales_tax_rate, 2),
+            use_tax_rate = ROUND(r.use_tax_rate, 2)
+        FROM (
+            SELECT geoid, sales_tax_rate, use_tax_rate
+            FROM tax_rates
+            WHERE effective_from <= %(as_of)s
+              AND (effective_to IS NULL OR effective_to > %(as_of)s)
+        ) r
+        WHERE s."GEOID" = r.geoid
+          AND (s.sales_tax_rate, s.use_tax_rate)
+              IS DISTINCT FROM (ROUND(r.sales_tax_rate, 2), ROUND(r.use_tax_rate, 2));
+    """, {"as_of": as_of or date.today()})
+    return cur.rowcount
+
+
+def seed_sample_rates(cur, rates=SAMPLE_STATE_RATES, default_rate=None,
+                      effective_from=SAMPLE_EFFECTIVE_FROM):
+    """Store per-state sample rates (matched by state name) in tax_rates
+
+    States not listed get default_rate, or no row at all when it is None.
+    Returns the number of tax_rates rows inserted or changed.
+    """
+    create_tax_rates_table(cur)
+    _create_staging(cur)
+    names = list(rates)
+    cur.execute("""
+        INSERT INTO tax_rates_staging (geoid, effective_from, sales_tax_rate, use_tax_rate)
+        SELECT s."GEOID", %(effective_from)s, r.rate, r.rate
+        FROM us_states s
+        LEFT JOIN unnest(%(names)s::text[], %(rates)s::numeric[]) AS r(name, rate)
+          ON r.name = s."NAME"
+        WHERE r.rate IS NOT NULL OR %(default_rate)s::numeric IS NOT NULL;
+
+        UPDATE tax_rates_staging
+        SET sales_tax_rate = %(default_rate)s, use_tax_rate = %(default_rate)s
+        WHERE sales_tax_rate IS NULL;
+    """, {
+        "effective_from": effective_from,
+        "names": names,
+        "rates": [rates[name] for name in names],
+        "default_rate": default_rate,
+    })
+    return _merge_staging(cur)
+
+
+def _read_rate_file(path):
+    """Read a CSV or Parquet rate file into the tax_rates column layout"""
+    import pandas as pd
+
+    if path.lower().endswith(('.parquet', '.pq')):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path, dtype={'geoid': str})
+    df.columns = [col.lower() for col in df.columns]
+
+    missing = {'geoid', 'sales_tax_rate', 'use_tax_rate'} - set(df.columns)
+    if missing:
+        raise ValueError(f"Rate file is missing columns: {', '.join(sorted(missing))}")
+    if 'effective_from' not in df:
+        df['effective_from'] = date.today()
+    if 'effective_to' not in df:
+        df['effective_to'] = None
+    return df[RATE_FILE_COLUMNS]
+
+
+def load_tax_rate_file(path, as_of=None):
+    """Bulk load a monthly rate file (CSV or Parquet) into tax_rates
+
+    The file is streamed with COPY into a temporary staging table and merged
+    in one statement; only new or changed rows are written, and only
+    us_states rows whose current rate changed are updated.
+    Returns a dict with the change counts and load time, or None on error.
+    """
+    start = time.perf_counter()
+    df = _read_rate_file(path)
+
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+
+    with get_connection() as conn:
+        if conn:
+            try:
+                cur = conn.cursor()
+                create_tax_rates_table(cur)
+                _create_staging(cur)
+                cur.copy_expert(
+                    f"COPY tax_rates_staging ({', '.join(RATE_FILE_COLUMNS)}) "
+                    "FROM STDIN WITH (FORMAT csv)", buf)
+
+                rates_changed = _merge_staging(cur)
+                states_updated = apply_current_rates(cur, as_of)
+                conn.commit()
+
+                stats = {
+                    "rows_read": len(df),
+                    "rates_changed": rates_changed,
+                    "states_updated": states_updated,
+                    "seconds": time.perf_counter() - start,
+                }
+                print(f"Loaded {os.path.basename(path)}: {stats['rows_read']:,} rows read, "
+                      f"{rates_changed:,} rates changed, {states_updated:,} states updated "
+                      f"in {stats['seconds']:.2f}s")
+                return stats
+
+            except Exception as e:
+                conn.rollback()
+                print(f"Error loading tax rate file: {e}")
+    return None
+
+
+if __name__ == "__main__":
+    import sys
+
+    for rate_file in sys.argv[1:]:
+        load_tax_rate_file(rate_file)
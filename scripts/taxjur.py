@@ -0,0 +1,281 @@
+# taxjur.py
+"""Tax jurisdiction mapping command line
+
+Each subcommand runs one pipeline stage. Stages record a fingerprint of
+their inputs in data/cache/stages.json and are skipped while those inputs
+and their outputs are unchanged (use --force to run anyway). Within the
+render stage each map is also skipped while the data it draws is unchanged
+(see render_cache.py); render --force redraws them all:
+
+    python taxjur.py load [state county place school_district | all]
+    python taxjur.py rates update [--file rates.csv] [--as-of 2024-07-01]
+    python taxjur.py analyze
+    python taxjur.py render [--workers 4]
+    python taxjur.py lookup -121.4944 38.5816
+    python taxjur.py serve [--port 8765]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+
+from settings import CACHE_DIR, DOCUMENTATION_DIR, JURISDICTION_LAYERS, LOOKUP_HOST, LOOKUP_PORT
+
+STAGE_CACHE_PATH = os.path.join(CACHE_DIR, "stages.json")
+
+# Files written by the render stage; a missing one forces a re-render
+RENDER_OUTPUTS = [
+    "state_area_map.png",
+    "regional_analysis.png",
+    "boundary_complexity.png",
+    "boundary_complexity_map.png",
+    "tax_rates_map.png",
+    "tax_rates_labeled.png",
+    "tax_rates_vector.svg",
+    "tax_rates_interactive.html",
+    "tax_rates_summary.xlsx",
+    "tiles/metadata.json",
+]
+
+
+def _fingerprint(value):
+    return hashlib.md5(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def read_stage_cache():
+    try:
+        with open(STAGE_CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_stage_cache(cache):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(STAGE_CACHE_PATH + ".tmp", "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(STAGE_CACHE_PATH + ".tmp", STAGE_CACHE_PATH)
+
+
+def run_stage(name, inputs, outputs, func, force=False):
+    """Run func() unless the stage last ran on the same inputs and its outputs are intact
+
+    inputs and outputs are callables returning JSON-serializable state;
+    outputs is re-evaluated after the run and stored with the input
+    fingerprint. func must return True on success; anything else (False,
+    or None from a function that swallowed its error) leaves the stage
+    unrecorded so the next run retries it. Returns True if the stage ran.
+    """
+    cache = read_stage_cache()
+    entry = cache.get(name)
+    input_key = _fingerprint(inputs())
+    if (not force and entry and entry.get("inputs") == input_key
+            and entry.get("outputs") == _fingerprint(outputs())):
+        print(f"[{name}] up to date, skipping")
+        return False
+
+    print(f"[{name}] running")
+    if func() is not True:
+        print(f"[{name}] failed; not recording it as done")
+        return True
+
+    # Re-read: nested stages may have updated the cache meanwhile
+    cache = read_stage_cache()
+    cache[name] = {"inputs": input_key, "outputs": _fingerprint(outputs())}
+    write_stage_cache(cache)
+    return True
+
+
+def _table_identity(table):
+    """The table's storage file: changes only when the table is replaced or dropped"""
+    from layer_cache import table_version
+
+    version = table_version(table)
+    return version.rsplit(":", 1)[0] if version else None
+
+
+def _layer_files(layer):
+    config = JURISDICTION_LAYERS[layer]
+    return sorted(path for pattern in config["shapefiles"] for path in glob.glob(pattern))
+
+
+def load_layer(layer, force=False):
+    """Import one jurisdiction layer unless its shapefiles are unchanged"""
+    from database_utils import import_jurisdiction_layers
+    from layer_cache import shapefile_version
+
+    table = JURISDICTION_LAYERS[layer]["table"]
+    if not _layer_files(layer):
+        print(f"[load:{layer}] no shapefiles found, skipping")
+        return False
+
+    # The bulk loader creates the table (from the shapefile's columns) and
+    # its index in the staging step, so no DDL is needed beforehand
+    def load():
+        results = import_jurisdiction_layers([layer])
+        return bool(results.get(layer))
+
+    return run_stage(
+        f"load:{layer}",
+        inputs=lambda: {path: shapefile_version(path) for path in _layer_files(layer)},
+        outputs=lambda: _table_identity(table),
+        func=load,
+        force=force,
+    )
+
+
+def cmd_load(args):
+    layers = list(JURISDICTION_LAYERS) if "all" in args.layers else args.layers
+    for layer in layers:
+        load_layer(layer, args.force)
+    return 0
+
+
+def cmd_rates_update(args):
+    from layer_cache import table_version
+
+    load_layer("state")
+
+    if args.file:
+        from tax_rates import load_tax_rate_file
+
+        stat = os.stat(args.file)
+        source = {"file": os.path.abspath(args.file), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        update = lambda: load_tax_rate_file(args.file, args.as_of) is not None
+    else:
+        from database_utils import update_tax_rates
+        from tax_rates import DEFAULT_SAMPLE_RATE, SAMPLE_STATE_RATES
+
+        source = {"sample": SAMPLE_STATE_RATES, "default": DEFAULT_SAMPLE_RATE}
+        update = update_tax_rates
+
+    run_stage(
+        "rates",
+        # A reloaded us_states (new relfilenode) needs its rates applied again
+        inputs=lambda: {"source": source, "as_of": args.as_of, "us_states": _table_identity("us_states")},
+        outputs=lambda: table_version("tax_rates"),
+        func=update,
+        force=args.force,
+    )
+    return 0
+
+
+def cmd_analyze(args):
+    from spatial_analysis import analyze_state_boundaries, calculate_tax_jurisdiction_metrics
+
+    load_layer("state")
+    # Always reports; the adjacency and metrics tables it reads are
+    # refreshed incrementally, so unchanged states are not recomputed
+    print("Analyzing state boundaries...")
+    analyze_state_boundaries()
+    print("\nCalculating tax jurisdiction metrics...")
+    calculate_tax_jurisdiction_metrics()
+    return 0
+
+
+def cmd_render(args):
+    from layer_cache import table_version
+
+    load_layer("state")
+
+    def render():
+        import render_cache
+        import visualization
+
+        render_cache.set_force(args.force)
+        print("Creating visualizations...")
+        # Every renderer runs even after a failure; any failure fails the stage
+        results = [
+            visualization.create_state_choropleth(),
+            visualization.create_regional_analysis_plots(),
+            visualization.create_complexity_visualization(),
+            visualization.visualize_boundary_complexity(),
+            # Also writes tax_rates_map.png from the same fetch
+            visualization.export_visualizations(workers=args.workers, force=args.force) is not None,
+        ]
+        render_cache.report()
+        return all(result is True for result in results)
+
+    run_stage(
+        "render",
+        inputs=lambda: {"us_states": table_version("us_states"), "tax_rates": table_version("tax_rates")},
+        outputs=lambda: {name: os.path.exists(os.path.join(DOCUMENTATION_DIR, name))
+                         for name in RENDER_OUTPUTS},
+        func=render,
+        force=args.force,
+    )
+    return 0
+
+
+def cmd_lookup(args):
+    from jurisdiction_index import JurisdictionIndex
+
+    coords = args.coords
+    if len(coords) % 2:
+        print("lookup expects LON LAT pairs")
+        return 2
+    index = JurisdictionIndex.from_cache(source="postgis")
+    for lon, lat in zip(coords[::2], coords[1::2]):
+        result = index.locate(lon, lat)
+        if result is None:
+            print(f"{lon}, {lat}: outside every jurisdiction")
+        else:
+            print(f"{lon}, {lat}: {result['STUSPS']} (GEOID {result['GEOID']}) "
+                  f"sales {result['sales_tax_rate']}, use {result['use_tax_rate']}")
+    return 0
+
+
+def cmd_serve(args):
+    from lookup_service import RELOAD_INTERVAL, run_service
+
+    run_service(args.host, args.port, args.reload_interval or RELOAD_INTERVAL)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="taxjur", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("load", help="import jurisdiction shapefiles into PostGIS")
+    load.add_argument("layers", nargs="*", default=["state"],
+                      choices=list(JURISDICTION_LAYERS) + ["all"])
+    load.add_argument("--force", action="store_true")
+    load.set_defaults(func=cmd_load)
+
+    rates = commands.add_parser("rates", help="manage tax rates")
+    rate_commands = rates.add_subparsers(dest="rates_command", required=True)
+    update = rate_commands.add_parser("update", help="load a rate file, or the sample rates")
+    update.add_argument("--file", help="CSV or Parquet rate file")
+    update.add_argument("--as-of", help="date whose rates are applied to us_states (default today)")
+    update.add_argument("--force", action="store_true")
+    update.set_defaults(func=cmd_rates_update)
+
+    analyze = commands.add_parser("analyze", help="report boundary and complexity metrics")
+    analyze.set_defaults(func=cmd_analyze)
+
+    render = commands.add_parser("render", help="write every map and export under documentation/")
+    render.add_argument("--workers", type=int, default=0)
+    render.add_argument("--force", action="store_true")
+    render.set_defaults(func=cmd_render)
+
+    lookup = commands.add_parser("lookup", help="resolve coordinates to a jurisdiction and rates")
+    lookup.add_argument("coords", nargs="+", type=float, metavar="LON LAT")
+    lookup.set_defaults(func=cmd_lookup)
+
+    serve = commands.add_parser("serve", help="run the local HTTP lookup service")
+    serve.add_argument("--host", default=LOOKUP_HOST)
+    serve.add_argument("--port", type=int, default=LOOKUP_PORT)
+    serve.add_argument("--reload-interval", type=float, help="seconds between data version checks")
+    serve.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+# vector_tiles.py
+"""Mapbox Vector Tiles of us_states for the interactive tax map
+
+Tiles are rendered by PostGIS (ST_TileEnvelope/ST_AsMVTGeom/ST_AsMVT) into a
+directory pyramid documentation/tiles/{z}/{x}/{y}.pbf with a TileJSON
+metadata.json beside it. Each state's name, rates and geometry are hashed;
+on later runs only the tiles covering states whose hash changed (before
+or after the change) are rendered again, spread over pooled connections.
+
+Browsers will not fetch tiles from file:// URLs, so serve the folder:
+
+    python -m http.server -d documentation
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from db_pool import get_connection
+from lod import LOD_LEVELS, TILE_SIZE_PX, select_lod_column
+from settings import CACHE_DIR, DB_POOL_MAX, DB_POOL_WORKERS, DOCUMENTATION_DIR, STATES_SRID
+
+TILE_DIR = os.path.join(DOCUMENTATION_DIR, "tiles")
+TILE_MANIFEST_PATH = os.path.join(CACHE_DIR, "vector_tiles.json")
+
+TILE_LAYER = "states"
+MIN_ZOOM = 0
+# Past this zoom the client scales up the zoom-8 tiles (maxNativeZoom)
+MAX_ZOOM = 8
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+# Bump when the tile contents change so the whole pyramid is rebuilt
+TILE_FORMAT_VERSION = 1
+
+TILE_FIELDS = {
+    "GEOID": "String",
+    "NAME": "String",
+    "STUSPS": "String",
+    "sales_tax_rate": "Number",
+    "use_tax_rate": "Number",
+}
+
+# Everything a state's tile features are drawn from
+TILE_HASH_SQL = """md5(concat_ws('|', "NAME", "STUSPS", sales_tax_rate::text, use_tax_rate::text,
+                                encode(ST_AsEWKB(geometry), 'hex')))"""
+
+# Web Mercator stops short of the poles
+MAX_LATITUDE = 85.0511287798
+
+
+def _tile_geometry_sql(zoom):
+    """Geometry expression at the level of detail suited to a zoom level"""
+    column = select_lod_column(TILE_SIZE_PX * 2 ** zoom)
+    return "geometry" if column == "geometry" else f"COALESCE({column}, geometry)"
+
+
+def tile_sql(zoom):
+    """Query returning one MVT tile (bytea) for parameters z, x, y"""
+    return f"""
+        WITH bounds AS (
+            SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS env
+        ),
+        features AS (
+            SELECT
+                ST_AsMVTGeom(ST_Transform({_tile_geometry_sql(zoom)}, 3857), b.env,
+                             {TILE_EXTENT}, {TILE_BUFFER}, true) AS geom,
+                "GEOID",
+                "NAME",
+                "STUSPS",
+                sales_tax_rate::float8 AS sales_tax_rate,
+                use_tax_rate::float8 AS use_tax_rate
+            FROM us_states, bounds b
+            WHERE geometry && ST_Transform(b.env, {STATES_SRID})
+        )
+        SELECT ST_AsMVT(features, '{TILE_LAYER}', {TILE_EXTENT}, 'geom')
+        FROM features
+        WHERE geom IS NOT NULL;
+    """
+
+
+def _lon_to_x(lon, n):
+    return min(n - 1, max(0, int((lon + 180.0) / 360.0 * n)))
+
+
+def _lat_to_y(lat, n):
+    lat = math.radians(min(MAX_LATITUDE, max(-MAX_LATITUDE, lat)))
+    return min(n - 1, max(0, int((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * n)))
+
+
+def covering_tiles(bboxes, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    """'z/x/y' names of the tiles overlapping any (xmin, ymin, xmax, ymax) lon/lat box"""
+    tiles = set()
+    for zoom in range(min_zoom, max_zoom + 1):
+        n = 2 ** zoom
+        for xmin, ymin, xmax, ymax in bboxes:
+            for x in range(_lon_to_x(xmin, n), _lon_to_x(xmax, n) + 1):
+                # Tile rows count down from the north
+                for y in range(_lat_to_y(ymax, n), _lat_to_y(ymin, n) + 1):
+                    tiles.add(f"{zoom}/{x}/{y}")
+    return tiles
+
+
+def _manifest_key():
+    settings = {
+        "format": TILE_FORMAT_VERSION,
+        "zooms": [MIN_ZOOM, MAX_ZOOM],
+        "extent": TILE_EXTENT,
+        "buffer": TILE_BUFFER,
+        "lod": LOD_LEVELS,
+    }
+    return hashlib.md5(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+
+def read_tile_manifest():
+    try:
+        with open(TILE_MANIFEST_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_tile_manifest(manifest):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(TILE_MANIFEST_PATH + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(TILE_MANIFEST_PATH + ".tmp", TILE_MANIFEST_PATH)
+
+
+def _state_hashes():
+    """Current hash of every state's tile contents, by GEOID"""
+    from tax_rates import ensure_rate_columns
+
+    with get_connection() as conn:
+        if conn is None:
+            raise ConnectionError("Database unavailable for vector tiles")
+        cur = conn.cursor()
+        ensure_rate_columns(cur)
+        conn.commit()
+        cur.execute(f'SELECT "GEOID", {TILE_HASH_SQL} FROM us_states;')
+        return dict(cur.fetchall())
+
+
+def _state_tiles(geoids):
+    """Tiles covering each state, from the bounding boxes of its polygon parts
+
+    Boxes are taken per part so states crossing the antimeridian (the
+    Aleutians) do not claim every tile column of the world.
+    """
+    with get_connection() as conn:
+        if conn is None:
+            raise ConnectionError("Database unavailable for vector tiles")
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT
+                s."GEOID",
+                ST_XMin(d.geom), ST_YMin(d.geom), ST_XMax(d.geom), ST_YMax(d.geom)
+            FROM us_states s, ST_Dump(s.geometry) d
+            WHERE s."GEOID" = ANY(%s);
+        """, (list(geoids),))
+        bboxes = {}
+        for geoid, *bbox in cur.fetchall():
+            bboxes.setdefault(geoid, []).append(bbox)
+    return {geoid: sorted(covering_tiles(boxes)) for geoid, boxes in bboxes.items()}
+
+
+def _tile_path(tile_dir, tile):
+    return os.path.join(tile_dir, *tile.split("/")) + ".pbf"
+
+
+def _clear_pyramid(tile_dir):
+    """Remove the zoom level folders of a previous pyramid, leaving other files alone"""
+    if os.path.isdir(tile_dir):
+        for name in os.listdir(tile_dir):
+            if name.isdigit():
+                shutil.rmtree(os.path.join(tile_dir, name))
+
+
+def _render_tiles(tile_dir, tiles):
+    """Render one batch of tiles on its own pooled connection
+
+    Tiles left without features are removed. Returns (written, removed).
+    """
+    queries = {zoom: tile_sql(zoom) for zoom in range(MIN_ZOOM, MAX_ZOOM + 1)}
+    written = removed = 0
+    with get_connection() as conn:
+        if conn is None:
+            raise ConnectionError("Database unavailable for vector tiles")
+        cur = conn.cursor()
+        for tile in tiles:
+            z, x, y = (int(part) for part in tile.split("/"))
+            cur.execute(queries[z], {"z": z, "x": x, "y": y})
+            row = cur.fetchone()
+            data = bytes(row[0]) if row and row[0] is not None else b""
+
+            path = _tile_path(tile_dir, tile)
+            if not data:
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed += 1
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            written += 1
+        conn.rollback()
+    return written, removed
+
+
+def write_tile_metadata(tile_dir, bounds):
+    """Write the TileJSON description of the pyramid"""
+    metadata = {
+        "tilejson": "3.0.0",
+        "name": "us_states",
+        "tiles": ["{z}/{x}/{y}.pbf"],
+        "minzoom": MIN_ZOOM,
+        "maxzoom": MAX_ZOOM,
+        "bounds": bounds,
+        "vector_layers": [{"id": TILE_LAYER, "fields": TILE_FIELDS}],
+    }
+    with open(os.path.join(tile_dir, "metadata.json"), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+
+def _layer_bounds():
+    with get_connection() as conn:
+        if conn is None:
+            raise ConnectionError("Database unavailable for vector tiles")
+        cur = conn.cursor()
+        cur.execute("SELECT ST_XMin(e), ST_YMin(e), ST_XMax(e), ST_YMax(e) "
+                    "FROM (SELECT ST_Extent(geometry) AS e FROM us_states) t;")
+        return [float(value) for value in cur.fetchone()]
+
+
+def build_vector_tiles(tile_dir=TILE_DIR, force=False, workers=DB_POOL_WORKERS):
+    """Render the tiles covering changed states (or all of them)
+
+    A state counts as changed when its hash differs from the manifest in
+    data/cache/vector_tiles.json; its old and new tiles are rendered again,
+    by at most one worker fewer than the pool has connections.
+    Returns a dict of counts, or None on error.
+    """
+    try:
+        start = time.perf_counter()
+        hashes = _state_hashes()
+
+        manifest = read_tile_manifest()
+        full = (force or manifest.get("key") != _manifest_key()
+                or manifest.get("tile_dir") != os.path.abspath(tile_dir)
+                or not os.path.exists(os.path.join(tile_dir, "metadata.json")))
+        previous = {} if full else manifest.get("states", {})
+
+        changed = [geoid for geoid, digest in hashes.items()
+                   if previous.get(geoid, {}).get("hash") != digest]
+        removed_states = [geoid for geoid in previous if geoid not in hashes]
+        if not changed and not removed_states:
+            print("Vector tiles up to date")
+            return {"states_changed": 0, "tiles_written": 0, "tiles_removed": 0}
+
+        if full:
+            _clear_pyramid(tile_dir)
+        os.makedirs(tile_dir, exist_ok=True)
+
+        new_tiles = _state_tiles(changed)
+        dirty = set()
+        for geoid in changed + removed_states:
+            dirty.update(previous.get(geoid, {}).get("tiles", []))
+            dirty.update(new_tiles.get(geoid, []))
+
+        # Low zooms hold the most geometry per tile; dealing tiles out
+        # round-robin from that end keeps the batches even
+        dirty = sorted(dirty, key=lambda tile: int(tile.split("/")[0]))
+        # Each worker holds a pooled connection; the pool raises when empty
+        workers = max(1, min(workers, DB_POOL_MAX - 1, len(dirty)))
+        batches = [dirty[i::workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda batch: _render_tiles(tile_dir, batch), batches))
+        written = sum(result[0] for result in results)
+        removed = sum(result[1] for result in results)
+
+        write_tile_metadata(tile_dir, _layer_bounds())
+        states = {geoid: entry for geoid, entry in previous.items() if geoid in hashes}
+        for geoid in changed:
+            states[geoid] = {"hash": hashes[geoid], "tiles": new_tiles.get(geoid, [])}
+        write_tile_manifest({"key": _manifest_key(), "tile_dir": os.path.abspath(tile_dir),
+                             "states": states})
+
+        print(f"Vector tiles: {len(changed) + len(removed_states)} changed states, "
+              f"{written:,} tiles written, {removed:,} removed "
+              f"in {time.perf_counter() - start:.2f}s")
+        return {"states_changed": len(changed) + len(removed_states),
+                "tiles_written": written, "tiles_removed": removed}
+
+    except Exception as e:
+        print(f"Error building vector tiles: {e}")
+    return None
+
+
+if __name__ == "__main__":
+    import sys
+
+    build_vector_tiles(force="--force" in sys.argv[1:])
@@ -0,0 +1,38 @@
+# conftest.py
+"""Shared fixtures: synthetic state layers so the tests need no database"""
+import os
+import sys
+
+import pytest
+
+# The scripts import each other as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+
+def make_states(boxes, rates=None, crs="EPSG:4269"):
+    """GeoDataFrame of box-shaped states: boxes are (minx, miny, maxx, maxy)"""
+    import geopandas as gpd
+    import shapely
+
+    rates = rates if rates is not None else [None] * len(boxes)
+    codes = [f"{i + 1:02d}" for i in range(len(boxes))]
+    return gpd.GeoDataFrame(
+        {
+            "GEOID": codes,
+            "STATEFP": codes,
+            "STUSPS": [f"S{code}" for code in codes],
+            "sales_tax_rate": [float("nan") if rate is None else float(rate) for rate in rates],
+            "use_tax_rate": [float("nan") if rate is None else float(rate) for rate in rates],
+        },
+        geometry=[shapely.box(*box) for box in boxes],
+        crs=crs,
+    )
+
+
+@pytest.fixture
+def grid_states():
+    """Four states in a 2x2 grid over the central US, rates 5-8"""
+    return make_states(
+        [(-100, 35, -95, 40), (-95, 35, -90, 40), (-100, 40, -95, 45), (-95, 40, -90, 45)],
+        rates=[5.0, 6.0, 7.0, 8.0],
+    )
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+import async_rates
+from async_rates import RateResolver
+from settings import DB_POOL_MAX
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Replace the database query; records the size of every batch"""
+    sizes = []
+
+    def query_rates_batch(lons, lats):
+        sizes.append(len(lons))
+        return [None if lon > 0 else {"STUSPS": f"S{int(-lon):02d}"} for lon in lons]
+
+    monkeypatch.setattr(async_rates, "query_rates_batch", query_rates_batch)
+    return sizes
+
+
+def test_points_resolve_in_order_through_batches(batches):
+    async def run():
+        async with RateResolver(max_batch_size=3, max_wait_ms=50) as resolver:
+            return await resolver.resolve_rates([(-i, 40.0) for i in range(1, 8)] + [(10.0, 40.0)])
+
+    results = asyncio.run(run())
+
+    assert [r["STUSPS"] for r in results[:7]] == [f"S{i:02d}" for i in range(1, 8)]
+    assert results[7] is None
+    assert sum(batches) == 8 and max(batches) <= 3
+
+
+def test_stop_settles_the_batch_being_collected(batches):
+    async def run():
+        # The long wait keeps the last request in the loop's hand, not the queue
+        resolver = RateResolver(max_batch_size=3, max_wait_ms=60_000)
+        await resolver.start()
+        pending = [asyncio.ensure_future(resolver.resolve(-i, 40.0)) for i in range(1, 8)]
+        await asyncio.sleep(0.05)
+        assert resolver.queue.empty() and resolver._collecting
+        await resolver.stop()
+        return await asyncio.wait_for(asyncio.gather(*pending), timeout=5)
+
+    results = asyncio.run(run())
+
+    assert [r["STUSPS"] for r in results] == [f"S{i:02d}" for i in range(1, 8)]
+    assert sorted(batches) == [1, 3, 3]
+
+
+def test_query_errors_reach_every_caller(monkeypatch):
+    def query_rates_batch(lons, lats):
+        raise ConnectionError("Database unavailable for rate lookup")
+
+    monkeypatch.setattr(async_rates, "query_rates_batch", query_rates_batch)
+
+    async def run():
+        async with RateResolver(max_wait_ms=1) as resolver:
+            return await asyncio.gather(*(resolver.resolve(-1.0, 40.0) for _ in range(3)),
+                                        return_exceptions=True)
+
+    assert all(isinstance(result, ConnectionError) for result in asyncio.run(run()))
+
+
+def test_in_flight_batches_leave_pool_headroom():
+    assert RateResolver().max_in_flight < DB_POOL_MAX or DB_POOL_MAX == 1
+    assert RateResolver(max_in_flight=DB_POOL_MAX * 2).max_in_flight == max(1, DB_POOL_MAX - 1)
@@ -0,0 +1,50 @@
+import numpy as np
+
+from border_proximity import BorderProximityIndex
+from conftest import make_states
+
+
+def three_strips():
+    # A(5) | B(5, 0.05 deg wide) | C(6)
+    return make_states(
+        [(-100.0, 40.0, -99.0, 41.0), (-99.0, 40.0, -98.95, 41.0), (-98.95, 40.0, -98.0, 41.0)],
+        rates=[5.0, 5.0, 6.0],
+    )
+
+
+def test_rate_change_beyond_equal_rated_neighbour():
+    index = BorderProximityIndex(three_strips())
+    result = index.nearest([-99.01], [40.5])
+
+    assert result["GEOID"][0] == "01"
+    assert result["neighbour_GEOID"][0] == "03"
+    assert result["neighbour_rate"][0] == 6.0
+    # 0.06 deg of longitude at 40.5N is about 5 km
+    assert 4.0 < result["distance_km"][0] < 6.5
+
+
+def test_point_in_differently_rated_state_sees_nearest_other_rate():
+    index = BorderProximityIndex(three_strips())
+    result = index.nearest([-98.9], [40.5])
+
+    assert result["GEOID"][0] == "03"
+    assert result["neighbour_GEOID"][0] == "02"
+    assert 3.0 < result["distance_km"][0] < 5.5
+
+
+def test_max_distance_and_outside_points():
+    index = BorderProximityIndex(three_strips())
+    result = index.nearest([-99.9, -50.0], [40.5, 40.5], max_distance_km=20)
+
+    assert np.isinf(result["distance_km"]).all()
+    assert list(result["neighbour_GEOID"]) == [None, None]
+    assert result["GEOID"][1] is None
+    assert list(index.within([-99.01, -99.9], [40.5, 40.5], 20)) == [True, False]
+
+
+def test_all_equal_rates_have_no_neighbour():
+    states = make_states([(-100, 40, -99, 41), (-99, 40, -98, 41)], rates=[5.0, 5.0])
+    result = BorderProximityIndex(states).nearest([-99.5], [40.5], max_distance_km=500)
+
+    assert np.isinf(result["distance_km"][0])
+    assert result["neighbour_GEOID"][0] is None
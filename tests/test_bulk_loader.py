@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from bulk_loader import NULL_FIELD, _carry_over_columns, _encode_bigint
+
+
+class RecordingCursor:
+    """Cursor stand-in that answers fetches from a queue and records statements"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append(statement)
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+    def fetchone(self):
+        return self.results.pop(0)
+
+
+LOADED = {"GEOID", "NAME", "geometry"}
+
+
+def test_carry_over_copies_live_only_columns_by_key():
+    cur = RecordingCursor(
+        [("GEOID", "text"), ("NAME", "text"), ("sales_tax_rate", "numeric(4,2)"),
+         ("geom_z4", "geometry(MultiPolygon,4269)"), ("geometry", "geometry(MultiPolygon,4269)")],
+        (True,),
+    )
+
+    assert _carry_over_columns(cur, "us_states", "us_states_staging", LOADED, "GEOID") == ["sales_tax_rate"]
+    # Catalog query, row check, two ADD COLUMNs and the UPDATE
+    assert len(cur.statements) == 5
+
+
+def test_carry_over_skips_live_table_without_key_column():
+    # A table created with unquoted columns has them in lowercase
+    cur = RecordingCursor([("gid", "integer"), ("geoid", "text"), ("region", "text")])
+
+    assert _carry_over_columns(cur, "us_states", "us_states_staging", LOADED, "GEOID") == []
+    assert len(cur.statements) == 1
+
+
+def test_carry_over_skips_missing_or_empty_live_table():
+    missing = RecordingCursor([])
+    assert _carry_over_columns(missing, "us_states", "us_states_staging", LOADED, "GEOID") == []
+
+    empty = RecordingCursor([("GEOID", "text"), ("sales_tax_rate", "numeric(4,2)")], (False,))
+    assert _carry_over_columns(empty, "us_states", "us_states_staging", LOADED, "GEOID") == []
+    assert len(empty.statements) == 2
+
+
+def test_bigint_nulls():
+    for value in (None, np.nan, pd.NA):
+        assert _encode_bigint(value) == NULL_FIELD
+    assert _encode_bigint(np.int64(7)) == b"\x00\x00\x00\x08" + (7).to_bytes(8, "big")
@@ -0,0 +1,55 @@
+import numpy as np
+import shapely
+
+from conftest import make_states
+from grid_index import BOUNDARY_BASE, EMPTY_CELL, GridIndex
+from jurisdiction_index import JurisdictionIndex
+
+
+def random_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-101.0, -89.0, n), rng.uniform(34.0, 46.0, n)
+
+
+def test_grid_matches_strtree(grid_states):
+    index = JurisdictionIndex(grid_states)
+    lon, lat = random_points(5_000)
+    expected = index.match(lon, lat)
+
+    index.build_grid(cell_size=0.7)
+    np.testing.assert_array_equal(index.match(lon, lat), expected)
+
+
+def test_grid_matches_strtree_on_irregular_polygons():
+    # Triangles sharing a diagonal and a ring with a hole, so every cell
+    # kind (interior, boundary, empty) occurs
+    states = make_states([(0, 0, 1, 1)] * 3)
+    states.geometry = [
+        shapely.Polygon([(-100, 35), (-90, 35), (-100, 45)]),
+        shapely.Polygon([(-90, 35), (-90, 45), (-100, 45)]),
+        shapely.Polygon([(-89, 35), (-85, 35), (-85, 45), (-89, 45)],
+                        holes=[[(-88, 38), (-86, 38), (-86, 42), (-88, 42)]]),
+    ]
+    index = JurisdictionIndex(states)
+    rng = np.random.default_rng(1)
+    lon, lat = rng.uniform(-101.0, -84.0, 5_000), rng.uniform(34.0, 46.0, 5_000)
+    expected = index.match(lon, lat)
+
+    grid = index.build_grid(cell_size=0.5)
+    np.testing.assert_array_equal(index.match(lon, lat), expected)
+    assert (grid.cells >= 0).any()
+    assert (grid.cells <= BOUNDARY_BASE).any()
+    assert (grid.cells == EMPTY_CELL).any()
+
+
+def test_points_outside_the_grid(grid_states):
+    grid = GridIndex(grid_states.geometry.values, cell_size=1.0)
+
+    assert list(grid.match([-150.0, 0.0, -97.5], [37.5, 0.0, 37.5])) == [-1, -1, 0]
+
+
+def test_stats_count_every_cell(grid_states):
+    stats = GridIndex(grid_states.geometry.values, cell_size=1.0).stats()
+
+    assert stats["interior"] + stats["boundary"] + stats["empty"] == stats["cells"]
+    assert stats["interior"] > 0 and stats["boundary"] > 0
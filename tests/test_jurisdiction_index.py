@@ -0,0 +1,45 @@
+import numpy as np
+
+from conftest import make_states
+from jurisdiction_index import JurisdictionIndex
+
+
+def test_locate_many_resolves_attributes_and_rates(grid_states):
+    index = JurisdictionIndex(grid_states)
+    result = index.locate_many([-97.5, -92.5, -97.5, -92.5, -50.0], [37.5, 37.5, 42.5, 42.5, 37.5])
+
+    assert list(result["index"]) == [0, 1, 2, 3, -1]
+    assert list(result["GEOID"]) == ["01", "02", "03", "04", None]
+    assert list(result["STUSPS"][:4]) == ["S01", "S02", "S03", "S04"]
+    np.testing.assert_array_equal(result["sales_tax_rate"][:4], [5.0, 6.0, 7.0, 8.0])
+    assert np.isnan(result["sales_tax_rate"][4])
+
+
+def test_locate_single_point(grid_states):
+    index = JurisdictionIndex(grid_states)
+
+    assert index.locate(-92.5, 42.5) == {
+        "GEOID": "04", "STATEFP": "04", "STUSPS": "S04", "sales_tax_rate": 8.0, "use_tax_rate": 8.0,
+    }
+    assert index.locate(0.0, 0.0) is None
+
+
+def test_shared_border_keeps_first_state(grid_states):
+    index = JurisdictionIndex(grid_states)
+
+    # On the -95 meridian between states 01 and 02
+    assert index.match([-95.0], [37.5])[0] == 0
+
+
+def test_reprojects_to_states_srid(grid_states):
+    index = JurisdictionIndex(grid_states.to_crs(epsg=3857))
+
+    assert list(index.locate_many([-97.5, -92.5], [37.5, 42.5])["GEOID"]) == ["01", "04"]
+
+
+def test_missing_rate_columns_resolve_to_nan():
+    states = make_states([(-100, 35, -95, 40)]).drop(columns=["sales_tax_rate", "use_tax_rate"])
+    result = JurisdictionIndex(states).locate(-97.5, 37.5)
+
+    assert result["GEOID"] == "01"
+    assert np.isnan(result["sales_tax_rate"]) and np.isnan(result["use_tax_rate"])
@@ -0,0 +1,62 @@
+import numpy as np
+
+from conftest import make_states
+from jurisdiction_stack import JurisdictionStack
+
+
+def nested_stack():
+    """Two states; state 01 (5%) holds two counties (1%, no rate), a place
+    (0.5%) across both and two school districts (0.25%, 0.125%)"""
+    state = make_states([(0, 0, 4, 4), (4, 0, 8, 4)], rates=[5.0, 6.0])
+    county = make_states([(0, 0, 2, 4), (2, 0, 4, 4)], rates=[1.0, None])
+    county["GEOID"] = ["01001", "01003"]
+    county["STATEFP"] = "01"
+    place = make_states([(1, 1, 3, 3)], rates=[0.5])
+    place["GEOID"] = ["0100100"]
+    district = make_states([(0, 0, 4, 2), (0, 2, 4, 4)], rates=[0.25, 0.125])
+    district["GEOID"] = ["0100010", "0100020"]
+    district["STATEFP"] = "01"
+    return JurisdictionStack({"state": state, "county": county, "place": place,
+                              "school_district": district})
+
+
+def test_point_inside_every_layer():
+    result = nested_stack().resolve([1.5], [1.5])
+    jurisdictions = result["jurisdictions"]
+
+    assert list(jurisdictions["layer"]) == ["state", "county", "place", "school_district"]
+    assert list(jurisdictions["GEOID"]) == ["01", "01001", "0100100", "0100010"]
+    assert result["STATEFP"][0] == "01"
+    np.testing.assert_allclose(result["combined_sales_tax_rate"], [5.0 + 1.0 + 0.5 + 0.25])
+    np.testing.assert_allclose(result["combined_use_tax_rate"], [5.0 + 1.0 + 0.5 + 0.25])
+
+
+def test_gap_without_place():
+    result = nested_stack().resolve([0.5], [3.5])
+    jurisdictions = result["jurisdictions"]
+
+    assert list(jurisdictions["layer"]) == ["state", "county", "school_district"]
+    assert list(jurisdictions["GEOID"]) == ["01", "01001", "0100020"]
+    np.testing.assert_allclose(result["combined_sales_tax_rate"], [5.0 + 1.0 + 0.125])
+
+
+def test_missing_rate_counts_as_zero_but_is_listed():
+    result = nested_stack().resolve([2.5], [2.5])
+    jurisdictions = result["jurisdictions"]
+
+    assert list(jurisdictions["GEOID"]) == ["01", "01003", "0100100", "0100020"]
+    assert np.isnan(jurisdictions["sales_tax_rate"][1])
+    np.testing.assert_allclose(result["combined_sales_tax_rate"], [5.0 + 0.5 + 0.125])
+
+
+def test_combined_rates_of_many_points():
+    lon = [1.5, 0.5, 2.5, 6.0, 10.0, 3.5]
+    lat = [1.5, 3.5, 2.5, 2.0, 10.0, 0.5]
+    result = nested_stack().resolve(lon, lat)
+
+    # State 02 has no lower layers; the point at (10, 10) is outside every state
+    expected = [6.75, 6.125, 5.625, 6.0, np.nan, 5.25]
+    np.testing.assert_allclose(result["combined_sales_tax_rate"], expected)
+    assert list(result["STATEFP"][:4]) == ["01", "01", "01", "02"]
+    assert result["STATEFP"][4] is None
+    assert list(result["jurisdictions"]["point"]) == [0, 0, 0, 0, 1, 1, 1, 2, 2, 2, 2, 3, 5, 5, 5]
@@ -0,0 +1,91 @@
+from contextlib import contextmanager
+
+import pytest
+
+import db_pool
+from layer_cache import bump_data_version, table_version, track_data_version
+
+
+class ScriptedCursor:
+    """Cursor stand-in answering fetchone() from a queue and recording statements"""
+
+    def __init__(self, *rows):
+        self.rows = list(rows)
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append(" ".join(statement.split()))
+
+    def fetchone(self):
+        return self.rows.pop(0)
+
+
+class ScriptedConnection:
+    def __init__(self, cur):
+        self.cur = cur
+        self.commits = 0
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def connect(monkeypatch):
+    def install(*rows):
+        conn = ScriptedConnection(ScriptedCursor(*rows))
+
+        @contextmanager
+        def get_connection():
+            yield conn
+
+        monkeypatch.setattr(db_pool, "get_connection", get_connection)
+        return conn
+
+    return install
+
+
+def is_ddl(statement):
+    return statement.split()[0].upper() in {"CREATE", "DROP", "ALTER"}
+
+
+def test_table_version_only_reads(connect):
+    conn = connect((16384, True), (7,))
+
+    assert table_version("us_states") == "table:us_states:16384:7"
+    assert not any(is_ddl(statement) for statement in conn.cur.statements)
+    assert conn.commits == 0
+
+
+def test_table_version_without_tracking(connect):
+    connect((16384, False))
+    assert table_version("us_states") == "table:us_states:16384:0"
+
+    connect(None)
+    assert table_version("missing") is None
+
+
+def test_bump_is_plain_dml():
+    cur = ScriptedCursor()
+    bump_data_version(cur, "us_states")
+
+    assert len(cur.statements) == 1 and cur.statements[0].startswith("INSERT INTO data_versions")
+
+
+def test_track_creates_function_only_when_missing():
+    installed = ScriptedCursor((True, True, True))
+    assert track_data_version(installed, "us_states") is False
+    assert len(installed.statements) == 1
+
+    new_table = ScriptedCursor((True, True, False))
+    assert track_data_version(new_table, "us_states") is True
+    assert not any("CREATE OR REPLACE FUNCTION" in statement for statement in new_table.statements)
+
+    fresh = ScriptedCursor((True, False, False))
+    assert track_data_version(fresh, "us_states") is True
+    assert any("CREATE OR REPLACE FUNCTION" in statement for statement in fresh.statements)
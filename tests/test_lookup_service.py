@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import pytest
+
+import lookup_service
+from conftest import make_states
+from jurisdiction_index import JurisdictionIndex
+from lookup_service import LookupService
+
+
+@pytest.fixture
+def versions(monkeypatch, grid_states):
+    """Serve grid_states; the returned dict is the reported us_states version"""
+    version = {"us_states": "v1", "tax_rates": "r1"}
+    layers = {"v1": grid_states, "v2": make_states([(-100, 35, -90, 45)], rates=[9.0])}
+    monkeypatch.setattr(lookup_service, "source_version", lambda: dict(version))
+    monkeypatch.setattr(lookup_service, "build_index",
+                        lambda: JurisdictionIndex(layers[version["us_states"]]))
+    return version
+
+
+def test_dispatch_routes_and_errors(versions):
+    async def run():
+        service = LookupService()
+        not_ready = await service.dispatch("GET", "/lookup?lon=-97.5&lat=37.5", b"")
+        await service.reload()
+        body = json.dumps({"points": [[-92.5, 42.5], [0.0, 0.0]]}).encode()
+        return not_ready, [
+            await service.dispatch("GET", "/lookup?lon=-97.5&lat=37.5", b""),
+            await service.dispatch("POST", "/lookup/batch", body),
+            await service.dispatch("GET", "/lookup?lon=abc&lat=37.5", b""),
+            await service.dispatch("POST", "/lookup?lon=-97.5&lat=37.5", b""),
+            await service.dispatch("POST", "/lookup/batch", b"{}"),
+            await service.dispatch("GET", "/nowhere", b""),
+            await service.dispatch("GET", "/health", b""),
+        ]
+
+    not_ready, (single, batch, bad, method, body, missing, health) = asyncio.run(run())
+
+    assert not_ready[0] == 503
+    assert single == (200, {"lon": -97.5, "lat": 37.5, "jurisdiction": {
+        "GEOID": "01", "STATEFP": "01", "STUSPS": "S01", "sales_tax_rate": 5.0, "use_tax_rate": 5.0}})
+    assert batch[0] == 200
+    assert [r and r["GEOID"] for r in batch[1]["results"]] == ["04", None]
+    assert [bad[0], method[0], body[0], missing[0]] == [400, 405, 400, 404]
+    assert health[1]["jurisdictions"] == 4 and health[1]["version"]["us_states"] == "v1"
+
+
+def test_reload_loop_swaps_index_on_version_change(versions):
+    async def run():
+        service = LookupService(reload_interval=0.01)
+        await service.start()
+        try:
+            before = await service.lookup({"lon": ["-92.5"], "lat": ["42.5"]})
+            versions["us_states"] = "v2"
+            for _ in range(200):
+                if service.snapshot["version"]["us_states"] == "v2":
+                    break
+                await asyncio.sleep(0.01)
+            after = await service.lookup({"lon": ["-92.5"], "lat": ["42.5"]})
+        finally:
+            await service.stop()
+        return before, after, service.reloads
+
+    before, after, reloads = asyncio.run(run())
+
+    assert before["jurisdiction"]["sales_tax_rate"] == 8.0
+    assert after["jurisdiction"]["sales_tax_rate"] == 9.0
+    assert reloads == 2
+
+
+def test_http_keep_alive_round_trip(versions):
+    from load_test_service import _request
+
+    async def run():
+        service = LookupService()
+        await service.reload()
+        server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            statuses = [
+                await _request(reader, writer, "GET", "/lookup?lon=-97.5&lat=37.5"),
+                await _request(reader, writer, "POST", "/lookup/batch", b'{"points": [[-92.5, 42.5]]}'),
+                await _request(reader, writer, "GET", "/missing"),
+            ]
+            writer.close()
+            await writer.wait_closed()
+        return statuses, service.requests
+
+    statuses, requests = asyncio.run(run())
+
+    assert statuses == [200, 200, 404]
+    assert requests == 3
@@ -0,0 +1,92 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from rate_history import RateHistory
+
+INTERVALS = [
+    # geoid, effective_from, effective_to (exclusive), sales, use
+    ("06", date(2020, 1, 1), date(2022, 7, 1), 7.25, 7.0),
+    ("06", date(2022, 7, 1), None, 7.5, 7.25),
+    ("36", date(1965, 3, 1), date(2021, 1, 1), 4.0, 4.0),
+    ("48", date(2019, 1, 1), date(2019, 6, 1), 6.25, 6.0),
+    # Gap in 48 until 2020-01-01
+    ("48", date(2020, 1, 1), None, 6.5, 6.25),
+]
+
+
+def build(intervals=INTERVALS):
+    geoids, starts, ends, sales, use = zip(*intervals)
+    ends = [np.datetime64("NaT") if end is None else end for end in ends]
+    return RateHistory(geoids, starts, ends, sales, use)
+
+
+def reference_rate(intervals, geoid, day):
+    """Scalar lookup: the latest interval of geoid with from <= day < to"""
+    best = None
+    for g, start, end, sales, use in intervals:
+        if g == geoid and start <= day and (end is None or day < end):
+            if best is None or start > best[0]:
+                best = (start, sales, use)
+    return None if best is None else {"sales_tax_rate": best[1], "use_tax_rate": best[2]}
+
+
+def test_boundary_dates():
+    history = build()
+
+    assert history.rate_at("06", date(2019, 12, 31)) is None
+    assert history.rate_at("06", date(2020, 1, 1))["sales_tax_rate"] == 7.25
+    assert history.rate_at("06", date(2022, 6, 30))["sales_tax_rate"] == 7.25
+    # effective_to is exclusive: the next interval takes over that day
+    assert history.rate_at("06", date(2022, 7, 1))["sales_tax_rate"] == 7.5
+    assert history.rate_at("48", date(2019, 5, 31))["use_tax_rate"] == 6.0
+    assert history.rate_at("48", date(2019, 6, 1)) is None
+    assert history.rate_at("36", date(2021, 1, 1)) is None
+
+
+def test_open_ended_and_pre_epoch_intervals():
+    history = build()
+
+    assert history.rate_at("06", date(2099, 12, 31)) == {"sales_tax_rate": 7.5, "use_tax_rate": 7.25}
+    assert history.rate_at("36", date(1965, 3, 1))["sales_tax_rate"] == 4.0
+    assert history.rate_at("36", date(1965, 2, 28)) is None
+
+
+def test_unknown_geoids():
+    history = build()
+    rates = history.rates_at(["01", "10", "99", "06"], ["2021-01-01"] * 4)
+
+    assert np.isnan(rates["sales_tax_rate"][:3]).all()
+    assert rates["sales_tax_rate"][3] == 7.25
+    assert history.rate_at("", date(2021, 1, 1)) is None
+
+
+def test_empty_history():
+    empty = np.array([], dtype=object)
+    history = RateHistory(empty, empty, empty, empty, empty)
+
+    assert len(history) == 0
+    assert history.rate_at("06", date(2021, 1, 1)) is None
+    assert np.isnan(history.rates_at(["06", "48"], ["2021-01-01", "2021-01-01"])["use_tax_rate"]).all()
+
+
+def test_vectorized_lookup_matches_scalar_reference():
+    history = build()
+    rng = np.random.default_rng(0)
+    geoids = rng.choice(["01", "06", "36", "48", "99"], 2_000)
+    days = [date(1960, 1, 1) + timedelta(days=int(n)) for n in rng.integers(0, 50_000, 2_000)]
+    # Every interval edge, and the day before each
+    for g, start, end, _, _ in INTERVALS:
+        for edge in [start, end]:
+            if edge is not None:
+                geoids = np.append(geoids, [g, g])
+                days += [edge, edge - timedelta(days=1)]
+
+    rates = history.rates_at(geoids, days)
+    for i, (geoid, day) in enumerate(zip(geoids, days)):
+        expected = reference_rate(INTERVALS, geoid, day)
+        if expected is None:
+            assert np.isnan(rates["sales_tax_rate"][i]), (geoid, day)
+        else:
+            assert rates["sales_tax_rate"][i] == expected["sales_tax_rate"], (geoid, day)
+            assert rates["use_tax_rate"][i] == expected["use_tax_rate"], (geoid, day)
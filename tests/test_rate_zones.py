@@ -0,0 +1,52 @@
+import numpy as np
+import shapely
+
+from conftest import make_states
+from rate_zones import ZONE_COLUMNS, _state_inputs, build_state_zones, state_input_hash
+
+
+def layered_state():
+    """One state (5%) split into two counties (1%, 2%) with a place (0.5%) across both"""
+    state = make_states([(0, 0, 4, 4)], rates=[5.0])
+    county = make_states([(0, 0, 2, 4), (2, 0, 4, 4)], rates=[1.0, 2.0])
+    county["GEOID"] = ["01001", "01002"]
+    place = make_states([(1, 1, 3, 3)], rates=[0.5])
+    place["GEOID"] = ["0100100"]
+    return {"state": state, "county": county, "place": place}
+
+
+def test_overlay_sums_rates_per_zone():
+    zones = build_state_zones("01", layered_state(), ["state", "county", "place"])
+
+    assert list(zones.columns) == ZONE_COLUMNS + ["geometry"]
+    assert list(zones["geoids"]) == ["01;01001", "01;01001;0100100", "01;01002", "01;01002;0100100"]
+    np.testing.assert_allclose(zones["sales_tax_rate"], [6.0, 6.5, 7.0, 7.5])
+    np.testing.assert_allclose(shapely.area(zones.geometry.values), [6.0, 2.0, 6.0, 2.0])
+    assert list(zones["zone_id"]) == ["01-00000", "01-00001", "01-00002", "01-00003"]
+    assert (zones["STATEFP"] == "01").all()
+
+
+def test_layers_missing_for_a_state_are_skipped():
+    layers = layered_state()
+    del layers["place"]
+    zones = build_state_zones("01", layers, ["state", "county", "place"])
+
+    assert list(zones["geoids"]) == ["01;01001", "01;01002"]
+
+
+def test_input_hash_tracks_rates_not_row_order():
+    layers = layered_state()
+    digest = state_input_hash(layers)
+
+    reordered = dict(layers, county=layers["county"].iloc[::-1])
+    assert state_input_hash(reordered) == digest
+
+    changed = dict(layers, place=layers["place"].assign(sales_tax_rate=[0.75]))
+    assert state_input_hash(changed) != digest
+
+
+def test_state_inputs_group_layers_by_state(grid_states):
+    states = _state_inputs({"state": grid_states})
+
+    assert sorted(states) == ["01", "02", "03", "04"]
+    assert list(states["03"]["state"]["GEOID"]) == ["03"]
@@ -0,0 +1,34 @@
+import render_pipeline
+import visualization
+from conftest import make_states
+
+
+def test_tax_rates_map_shares_its_key_with_the_pipeline(monkeypatch, grid_states, tmp_path):
+    grid_states["NAME"] = grid_states["STUSPS"]
+    checked = {}
+
+    def is_current(name, key, outputs, force=False):
+        checked.setdefault(name, []).append(key)
+        return True
+
+    for module in (render_pipeline, visualization):
+        monkeypatch.setattr(module, "fetch_tax_rate_layer", lambda: grid_states.copy())
+        monkeypatch.setattr(module, "is_current", is_current)
+    monkeypatch.setattr(render_pipeline, "build_vector_tiles", lambda *args, **kwargs: 0)
+
+    assert visualization.visualize_tax_rates(str(tmp_path)) is True
+    render_pipeline.run_export_pipeline(str(tmp_path), tiles_url="https://tiles/{z}/{x}/{y}.pbf")
+
+    first, second = checked["tax_rates_map"]
+    assert first == second
+    # The tile URL only changes the key of the interactive map
+    assert checked["interactive_html"] != [render_pipeline.export_key(
+        "interactive_html", render_pipeline.frame_hash(grid_states))]
+
+
+def test_export_key_depends_on_data():
+    a = make_states([(0, 0, 1, 1)], rates=[5.0])
+    b = make_states([(0, 0, 1, 1)], rates=[6.0])
+
+    assert render_pipeline.export_key("tax_rates_map", render_pipeline.frame_hash(a)) != \
+        render_pipeline.export_key("tax_rates_map", render_pipeline.frame_hash(b))
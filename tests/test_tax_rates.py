@@ -0,0 +1,52 @@
+from tax_rates import _create_staging, _merge_staging, ensure_rate_columns
+
+
+class ColumnCursor:
+    """Cursor stand-in reporting which us_states columns exist"""
+
+    def __init__(self, existing):
+        self.existing = existing
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append(" ".join(statement.split()))
+
+    def fetchall(self):
+        return [(name,) for name in self.existing]
+
+
+def test_existing_rate_columns_take_no_lock():
+    cur = ColumnCursor(["sales_tax_rate", "use_tax_rate"])
+    ensure_rate_columns(cur)
+
+    assert len(cur.statements) == 1
+    assert not any("ALTER" in statement for statement in cur.statements)
+
+
+def test_only_missing_rate_columns_are_added():
+    cur = ColumnCursor(["sales_tax_rate"])
+    ensure_rate_columns(cur, with_tax_rate=True)
+
+    assert cur.statements[-1] == (
+        "ALTER TABLE us_states ADD COLUMN IF NOT EXISTS use_tax_rate numeric(4,2), "
+        "ADD COLUMN IF NOT EXISTS tax_rate numeric(4,2);"
+    )
+
+
+class MergeCursor(ColumnCursor):
+    def __init__(self):
+        super().__init__([])
+
+    def fetchone(self):
+        return (0,)
+
+
+def test_repeated_staged_rates_resolve_to_the_last_row():
+    cur = MergeCursor()
+    _create_staging(cur)
+    _merge_staging(cur)
+
+    assert "line bigserial" in cur.statements[0]
+    merge = cur.statements[1]
+    assert "SELECT DISTINCT ON (geoid, effective_from)" in merge
+    assert "ORDER BY geoid, effective_from, line DESC" in merge